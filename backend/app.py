@@ -3,10 +3,8 @@ from datetime import datetime
 import os
 from werkzeug.utils import secure_filename
 from models.user import User, db
-from models.upload import Upload
+from models.upload import Upload, ensure_upload_columns
 from config import *
-from utils.data_extraction import DataExtractor
-from utils.ai_services import AIServices
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -17,12 +15,20 @@ from routes.auth import auth_bp, oauth
 from routes.upload import upload_bp
 from routes.bills import bills_bp
 from routes.health import health_bp
+from routes.analytics import analytics_bp
 from flask_caching import Cache
+from utils.in_memory_request import InMemoryUploadRequest
+from utils.json_provider import FastJSONProvider
+from utils.maintenance_commands import rollups_cli, search_cli
+from models.search import ensure_search_index
+from routes.search import search_bp
 import redis
 
 logger = get_logger(__name__)
 
 app = Flask(__name__)
+app.request_class = InMemoryUploadRequest
+app.json = FastJSONProvider(app)
 CORS(app)
 
 # Register blueprints
@@ -30,7 +36,11 @@ app.register_blueprint(auth_bp)
 app.register_blueprint(upload_bp)
 app.register_blueprint(bills_bp)
 app.register_blueprint(health_bp)
+app.register_blueprint(analytics_bp)
+app.register_blueprint(search_bp)
 oauth.init_app(app)
+app.cli.add_command(rollups_cli)
+app.cli.add_command(search_cli)
 
 # Initialize rate limiter
 limiter = Limiter(
@@ -60,10 +70,6 @@ db.init_app(app)
 # Create uploads folder if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# Initialize data extractor and AI services
-data_extractor = DataExtractor()
-ai_services = AIServices()
-
 # Load S3 bucket name from environment
 S3_BUCKET_NAME = os.environ.get('S3_BUCKET_NAME', 'spendlytic')
 
@@ -74,6 +80,14 @@ with app.app_context():
         print("Database tables created successfully")
     except Exception as e:
         print(f"Error creating database tables: {str(e)}")
+    try:
+        ensure_upload_columns()
+    except Exception as e:
+        print(f"Error adding upload job columns: {str(e)}")
+    try:
+        ensure_search_index()
+    except Exception as e:
+        print(f"Full-text search index unavailable, search will scan bills: {str(e)}")
 
 cache = Cache(config={
     'CACHE_TYPE': 'RedisCache',
@@ -0,0 +1,128 @@
+"""
+Micro-benchmark for the redis_cache response path: the previous JSON round-trip
+(jsonify -> get_json -> json.dumps on a miss, json.loads -> jsonify on a hit) against
+storing and replaying the encoded response bytes, with the stdlib and orjson encoders.
+
+Run from backend/:  python -m benchmarks.bench_response_cache [--bills N] [--items N] [--repeat N]
+A dict stands in for Redis, so only serialization and response construction are measured.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify, make_response
+from utils.json_provider import FastJSONProvider, orjson
+from utils.cache_decorator import _entry, _encode_entry, _read, _build_response
+
+
+class DictRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode() if isinstance(value, str) else value
+
+
+def synthetic_bills(count, items_per_bill):
+    """
+    Bills shaped like Bill.to_dict(): Numeric columns come back from the database as Decimal
+    """
+    start = datetime(2024, 1, 1)
+    bills = []
+    for i in range(count):
+        date = start + timedelta(hours=7 * i)
+        bills.append({
+            'id': i + 1,
+            'merchant_name': f"Merchant {i % 50}",
+            'total_amount': Decimal(f"{(i * 37) % 10000}.{i % 100:02d}"),
+            'date': date.isoformat(),
+            'user_id': 1,
+            'created_at': date.isoformat(),
+            'updated_at': date.isoformat(),
+            's3_key': f"receipts/1/{i + 1}.jpg",
+            'items': [{
+                'id': i * items_per_bill + j + 1,
+                'description': f"Item {j} of bill {i}",
+                'quantity': Decimal(f"{j % 5 + 1}.00"),
+                'price': Decimal(f"{(i + j) % 500}.{j % 100:02d}"),
+                'bill_id': i + 1
+            } for j in range(items_per_bill)]
+        })
+    return bills
+
+
+def old_miss(redis_client, bills):
+    response, status = jsonify(bills), 200
+    redis_client.set('k', json.dumps([response.get_json(), status, 0]))
+    return response
+
+
+def old_hit(redis_client):
+    data, status, _ = json.loads(redis_client.get('k'))
+    return make_response((jsonify(data), status))
+
+
+def new_miss(redis_client, bills):
+    response = make_response((jsonify(bills), 200))
+    redis_client.set('k', _encode_entry(_entry(response), float('inf')))
+    return response
+
+
+def new_hit(redis_client):
+    entry, _ = _read(redis_client, 'k')
+    return _build_response(entry)
+
+
+def run(label, statement, repeat, number):
+    best = min(timeit.repeat(statement, repeat=repeat, number=number)) / number
+    print(f"  {label:<34} {best * 1000:9.3f} ms")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--bills', type=int, default=500)
+    parser.add_argument('--items', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+
+    bills = synthetic_bills(args.bills, args.items)
+    stdlib_app = Flask('stdlib')
+    fast_app = Flask('fast')
+    fast_app.json = FastJSONProvider(fast_app)
+
+    print(f"{args.bills} bills x {args.items} items, best of {args.repeat} x {args.number}")
+    if orjson is None:
+        print("  orjson is not installed: the fast provider falls back to the stdlib encoder")
+
+    results = {}
+    for name, app, miss, hit in (('before (stdlib, JSON round-trip)', stdlib_app, old_miss, old_hit),
+                                 ('bytes cache, stdlib encoder', stdlib_app, new_miss, new_hit),
+                                 ('after (bytes cache, orjson)', fast_app, new_miss, new_hit)):
+        redis_client = DictRedis()
+        with app.app_context():
+            print(name)
+            miss(redis_client, bills)
+            results[name] = (
+                run('miss (encode + store)', lambda: miss(redis_client, bills), args.repeat, args.number),
+                run('hit (read + respond)', lambda: hit(redis_client), args.repeat, args.number)
+            )
+            print(f"  {'response body':<34} {len(hit(redis_client).get_data()):9d} bytes")
+
+    before = results['before (stdlib, JSON round-trip)']
+    after = results['after (bytes cache, orjson)']
+    print(f"speedup: miss {before[0] / after[0]:.1f}x, hit {before[1] / after[1]:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -39,6 +39,7 @@ SQLALCHEMY_TRACK_MODIFICATIONS = os.getenv('SQLALCHEMY_TRACK_MODIFICATIONS', 'Fa
 UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
 MAX_CONTENT_LENGTH = os.getenv('MAX_CONTENT_LENGTH', '16777216')  # 16MB
 ALLOWED_EXTENSIONS = os.getenv('ALLOWED_EXTENSIONS', 'pdf,png,jpg,jpeg')
+UPLOAD_IN_MEMORY = os.getenv('UPLOAD_IN_MEMORY', 'False').lower() == 'true'  # Keep uploads in memory, never write them to UPLOAD_FOLDER
 
 # Rate limiting settings
 RATELIMIT_DEFAULT = os.getenv('RATELIMIT_DEFAULT', '100/hour')  # Default rate limit
@@ -51,6 +52,53 @@ MAX_UPLOADS_PER_DAY = int(os.getenv('MAX_UPLOADS_PER_DAY', '5'))  # Maximum uplo
 MAX_TOTAL_SIZE_PER_DAY = int(os.getenv('MAX_TOTAL_SIZE_PER_DAY', '104857600'))  # 100MB per day
 MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', '16777216'))  # 16MB per file
 
+# GET /api/bills pagination (opt-in with ?limit=)
+BILLS_PAGE_MAX_LIMIT = int(os.getenv('BILLS_PAGE_MAX_LIMIT', '100'))
+
+# Spend analytics (GET /api/analytics/spend) cache lifetime; entries are also dropped when bills change
+ANALYTICS_CACHE_TTL = int(os.getenv('ANALYTICS_CACHE_TTL', '600'))
+ANALYTICS_USE_ROLLUPS = os.getenv('ANALYTICS_USE_ROLLUPS', 'False').lower() == 'true'  # read spend_daily/spend_monthly instead of bills; enable after 'flask rollups rebuild'
+
+# GET /api/search page size
+SEARCH_MAX_LIMIT = int(os.getenv('SEARCH_MAX_LIMIT', '50'))
+
+# Background upload jobs
+UPLOAD_ASYNC_MODE = os.getenv('UPLOAD_ASYNC_MODE', 'False').lower() == 'true'  # Default mode when the request does not ask
+UPLOAD_JOB_WORKERS = int(os.getenv('UPLOAD_JOB_WORKERS', '4'))  # Background extraction workers per process
+
+# Batch uploads
+MAX_BATCH_FILES = int(os.getenv('MAX_BATCH_FILES', '20'))  # Maximum files in one batch request
+BATCH_UPLOAD_WORKERS = int(os.getenv('BATCH_UPLOAD_WORKERS', '4'))  # Files processed concurrently per batch
+
+# Extraction mode: 'text' (detect_document_text + parser/LLM) or 'expense' (Textract AnalyzeExpense, LLM only for gaps)
+EXTRACTION_MODE = os.getenv('EXTRACTION_MODE', 'text').lower()
+EXPENSE_MIN_CONFIDENCE = float(os.getenv('EXPENSE_MIN_CONFIDENCE', '80'))  # Textract confidence (0-100) needed to trust a field
+
+# Extraction cache (Textract + LLM results keyed by file SHA-256)
+EXTRACTION_CACHE_ENABLED = os.getenv('EXTRACTION_CACHE_ENABLED', 'True').lower() == 'true'
+EXTRACTION_CACHE_TTL = int(os.getenv('EXTRACTION_CACHE_TTL', '604800'))  # 7 days
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv('EXTRACTION_CACHE_MAX_ENTRIES', '10000'))
+
+# Image normalization before OCR (requires Pillow)
+IMAGE_PREPROCESSING_ENABLED = os.getenv('IMAGE_PREPROCESSING_ENABLED', 'True').lower() == 'true'
+IMAGE_TARGET_DPI = int(os.getenv('IMAGE_TARGET_DPI', '200'))
+IMAGE_PAGE_INCHES = float(os.getenv('IMAGE_PAGE_INCHES', '11'))  # Longest side is capped at TARGET_DPI * PAGE_INCHES pixels
+IMAGE_JPEG_QUALITY = int(os.getenv('IMAGE_JPEG_QUALITY', '85'))
+IMAGE_PREPROCESS_WORKERS = int(os.getenv('IMAGE_PREPROCESS_WORKERS', '0'))  # 0 = one per CPU core
+
+# Multi-page PDFs: pages are OCRed concurrently and stitched back in order
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', '50'))
+PDF_PAGE_WORKERS = int(os.getenv('PDF_PAGE_WORKERS', '8'))
+PDF_TEXT_LAYER_MIN_CHARS = int(os.getenv('PDF_TEXT_LAYER_MIN_CHARS', '200'))  # use a page's embedded text instead of OCR above this; 0 = always OCR
+TEXTRACT_POLL_INTERVAL = float(os.getenv('TEXTRACT_POLL_INTERVAL', '1.0'))  # async Textract jobs (PDFs already in S3)
+TEXTRACT_JOB_TIMEOUT = int(os.getenv('TEXTRACT_JOB_TIMEOUT', '300'))
+
+# OCR engine: 'textract' (AWS) or 'tesseract' (local, requires pytesseract and the tesseract binary)
+OCR_BACKEND = os.getenv('OCR_BACKEND', 'textract').lower()
+OCR_BACKEND_PER_REQUEST = os.getenv('OCR_BACKEND_PER_REQUEST', 'True').lower() == 'true'  # allow an 'ocr_backend' form field
+TESSERACT_WORKERS = int(os.getenv('TESSERACT_WORKERS', '0'))  # 0 = one per CPU core
+TESSERACT_LANG = os.getenv('TESSERACT_LANG', 'eng')
+
 # JWT settings
 JWT_ACCESS_TOKEN_EXPIRES = os.getenv('JWT_ACCESS_TOKEN_EXPIRES', '30')
 
@@ -58,10 +106,45 @@ JWT_ACCESS_TOKEN_EXPIRES = os.getenv('JWT_ACCESS_TOKEN_EXPIRES', '30')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
 
+# Deterministic receipt parser tried before the LLM
+FAST_PATH_ENABLED = os.getenv('FAST_PATH_ENABLED', 'True').lower() == 'true'
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv('FAST_PATH_MIN_CONFIDENCE', '0.9'))  # Below this the LLM is used
+
+# Prompt compaction before the LLM call
+PROMPT_COMPACTION_ENABLED = os.getenv('PROMPT_COMPACTION_ENABLED', 'True').lower() == 'true'
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', '1500'))  # Max tokens of receipt text sent to the LLM
+
+# Micro-batching of concurrent LLM extractions into one multi-document call
+LLM_BATCHING_ENABLED = os.getenv('LLM_BATCHING_ENABLED', 'False').lower() == 'true'
+LLM_BATCH_WINDOW_MS = int(os.getenv('LLM_BATCH_WINDOW_MS', '100'))  # How long to wait for more requests
+LLM_BATCH_MAX_SIZE = int(os.getenv('LLM_BATCH_MAX_SIZE', '8'))  # Receipts per call
+
+# LLM response cache (keyed on normalized OCR text)
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'True').lower() == 'true'
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', '2592000'))  # 30 days
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '50000'))
+
 # AWS settings
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1') 
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', '50'))  # Per shared boto3 client
+AWS_MAX_ATTEMPTS = int(os.getenv('AWS_MAX_ATTEMPTS', '2'))  # Adaptive retry mode; further retries go through utils/resilience.py
+AWS_CONNECT_TIMEOUT = float(os.getenv('AWS_CONNECT_TIMEOUT', '5'))
+AWS_READ_TIMEOUT = float(os.getenv('AWS_READ_TIMEOUT', '60'))
+S3_UPLOAD_WORKERS = int(os.getenv('S3_UPLOAD_WORKERS', '8'))  # Concurrent S3 archive uploads per process
+
+# Resilience for Textract and OpenAI calls
+TEXTRACT_TIMEOUT = float(os.getenv('TEXTRACT_TIMEOUT', '30'))  # Per-call deadline in seconds
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '45'))
+RESILIENCE_MAX_ATTEMPTS = int(os.getenv('RESILIENCE_MAX_ATTEMPTS', '3'))
+RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '0.2'))  # Full-jitter exponential backoff
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '2'))
+RETRY_BUDGET_RATIO = float(os.getenv('RETRY_BUDGET_RATIO', '0.2'))  # Retries + hedges allowed per call, on average
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', '5'))  # Consecutive failures before opening
+BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', '30'))  # Seconds before a trial call
+HEDGING_ENABLED = os.getenv('HEDGING_ENABLED', 'False').lower() == 'true'  # Duplicate calls slower than p95
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20'))  # Latency samples needed before hedging
 
 # Google settings
 GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
@@ -74,6 +157,17 @@ FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
 # Environment
 ENV = os.getenv('ENV', 'dev')
 
+# In-process L1 response cache in front of Redis (per worker; invalidated over Redis pub/sub)
+RESPONSE_L1_CACHE_ENABLED = os.getenv('RESPONSE_L1_CACHE_ENABLED', 'False').lower() == 'true'
+RESPONSE_L1_CACHE_TTL = float(os.getenv('RESPONSE_L1_CACHE_TTL', '2'))  # seconds
+RESPONSE_L1_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_L1_CACHE_MAX_ENTRIES', '1000'))
+CACHE_INVALIDATION_CHANNEL = os.getenv('CACHE_INVALIDATION_CHANNEL', 'spendlytic:cache_invalidate')
+
+# Single-flight recomputation of cached responses
+CACHE_LOCK_TTL = int(os.getenv('CACHE_LOCK_TTL', '10'))  # seconds; longer than the slowest cached view
+CACHE_LOCK_WAIT = float(os.getenv('CACHE_LOCK_WAIT', '5'))  # how long concurrent callers wait for the lock holder
+CACHE_LOCK_POLL_INTERVAL = float(os.getenv('CACHE_LOCK_POLL_INTERVAL', '0.05'))
+
 # Redis URL
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 
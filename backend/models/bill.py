@@ -1,6 +1,9 @@
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from . import db
+from .item import Item
+from .rollup import apply_bill_to_rollups, truncate_date
+from .search import contains_pattern, remove_from_search_index
 
 class Bill(db.Model):
     __tablename__ = "bills"
@@ -15,11 +18,14 @@ class Bill(db.Model):
     s3_key = db.Column(db.String(512), nullable=True)
     
     # Relationships
-    items = db.relationship('Item', backref='bill', lazy=True, cascade="all, delete-orphan")
+    # selectin: items of every bill in a result are loaded with one extra SELECT, not one per bill
+    items = db.relationship('Item', backref='bill', lazy='selectin', cascade="all, delete-orphan")
     
     # Unique constraint for bill per user
     __table_args__ = (
         db.UniqueConstraint('merchant_name', 'date', 'total_amount', 'user_id', name='uix_bill_user'),
+        # Serves the keyset pagination of get_user_bills_page (user_id equality, then date/id order)
+        db.Index('ix_bills_user_date_id', 'user_id', 'date', 'id'),
     )
 
     def to_dict(self):
@@ -35,6 +41,34 @@ class Bill(db.Model):
             'items': [item.to_dict() for item in self.items]
         }
 
+    @staticmethod
+    def rows_to_dicts(query) -> List[Dict[str, Any]]:
+        """
+        Serialize the bills selected by `query` from plain column rows, with the items of all
+        of them fetched in bulk: the query count does not grow with the number of bills.
+        Same shape as to_dict().
+        """
+        rows = query.with_entities(
+            Bill.id, Bill.merchant_name, Bill.total_amount, Bill.date, Bill.user_id,
+            Bill.created_at, Bill.updated_at, Bill.s3_key
+        ).all()
+        items = Item.items_by_bill([row.id for row in rows])
+        return [Bill._row_to_dict(row, items.get(row.id, [])) for row in rows]
+
+    @staticmethod
+    def _row_to_dict(row, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            'id': row.id,
+            'merchant_name': row.merchant_name,
+            'total_amount': row.total_amount,
+            'date': row.date.isoformat() if row.date else None,
+            'user_id': row.user_id,
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+            'updated_at': row.updated_at.isoformat() if row.updated_at else None,
+            's3_key': row.s3_key,
+            'items': items
+        }
+
     @staticmethod
     def create_bill(db, user_id: int, merchant_name: str, total_amount: float, date: datetime) -> 'Bill':
         """
@@ -57,12 +91,84 @@ class Bill(db.Model):
         """
         return db.session.query(Bill).filter(Bill.id == bill_id).first()
 
+    def get_bill_owner(bill_id: int) -> Optional[int]:
+        """
+        Get the user_id of a bill without loading the bill (None if it does not exist)
+        """
+        return db.session.query(Bill.user_id).filter(Bill.id == bill_id).scalar()
+
     def get_user_bills(user_id: int) -> List['Bill']:
         """
         Get all bills for a user
         """
         return db.session.query(Bill).filter(Bill.user_id == user_id).all()
 
+    def get_user_bills_data(user_id: int) -> List[Dict[str, Any]]:
+        """
+        Get all bills for a user, serialized (see rows_to_dicts)
+        """
+        return Bill.rows_to_dicts(db.session.query(Bill).filter(Bill.user_id == user_id))
+
+    def get_user_bills_page(user_id: int, limit: int, after: Optional[Tuple[datetime, int]] = None,
+                            date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                            merchant: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[Tuple[datetime, int]]]:
+        """
+        Get one page of a user's bills, newest first, ordered by (date, id), serialized (see rows_to_dicts).
+        `after` is the (date, id) of the last bill of the previous page (keyset pagination,
+        so deep pages cost the same as the first); date_to is exclusive.
+        Returns: (list, tuple) - (bill dicts, (date, id) to pass as `after` for the next page or None on the last page)
+        """
+        query = db.session.query(Bill).filter(Bill.user_id == user_id)
+        if date_from is not None:
+            query = query.filter(Bill.date >= date_from)
+        if date_to is not None:
+            query = query.filter(Bill.date < date_to)
+        if merchant:
+            query = query.filter(Bill.merchant_name.ilike(contains_pattern(merchant), escape='\\'))
+        if after is not None:
+            after_date, after_id = after
+            query = query.filter(db.or_(
+                Bill.date < after_date,
+                db.and_(Bill.date == after_date, Bill.id < after_id)
+            ))
+        # One extra row tells whether another page exists
+        bills = Bill.rows_to_dicts(query.order_by(Bill.date.desc(), Bill.id.desc()).limit(limit + 1))
+        if len(bills) > limit:
+            bills = bills[:limit]
+            return bills, (datetime.fromisoformat(bills[-1]['date']), bills[-1]['id'])
+        return bills, None
+
+    @staticmethod
+    def spend_by_period(user_id: int, granularity: str, date_from: Optional[datetime] = None,
+                        date_to: Optional[datetime] = None, by_merchant: bool = False) -> List[Dict[str, Any]]:
+        """
+        Total spend and bill count per week/month/year (and per merchant when by_merchant),
+        aggregated in SQL over the raw bills; date_to is exclusive. See also models.rollup.spend_from_rollups.
+        Returns: list - [{'period': 'YYYY-MM-DD', 'merchant_name'?, 'total', 'count'}, ...] ordered by period
+        """
+        period = truncate_date(Bill.date, granularity).label('period')
+        group_by = [period, Bill.merchant_name] if by_merchant else [period]
+        query = db.session.query(
+            *group_by,
+            db.func.sum(Bill.total_amount).label('total'),
+            db.func.count(Bill.id).label('count')
+        ).filter(Bill.user_id == user_id)
+        if date_from is not None:
+            query = query.filter(Bill.date >= date_from)
+        if date_to is not None:
+            query = query.filter(Bill.date < date_to)
+        rows = query.group_by(*group_by).order_by(*group_by).all()
+
+        result = []
+        for row in rows:
+            # date_trunc returns a timestamp, SQLite a string
+            key = row.period.date().isoformat() if isinstance(row.period, datetime) else str(row.period)[:10]
+            entry = {'period': key, 'total': round(float(row.total or 0), 2), 'count': row.count}
+            if by_merchant:
+                entry['merchant_name'] = row.merchant_name
+            result.append(entry)
+        return result
+
     @staticmethod
     def update_bill(db, bill_id: int, **kwargs) -> 'Bill':
         """
@@ -83,6 +189,9 @@ class Bill(db.Model):
         """
         bill = Bill.get_bill(bill_id)
         if bill:
+            # Same transaction as the delete, so the rollups and search index never drift from the bills
+            apply_bill_to_rollups(bill.user_id, bill.date, bill.merchant_name, bill.total_amount, sign=-1)
+            remove_from_search_index(bill.id)
             db.session.delete(bill)
             db.session.commit()
             return True
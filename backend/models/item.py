@@ -54,6 +54,29 @@ class Item(db.Model):
         """
         return db.query(Item).filter(Item.bill_id == bill_id).all()
 
+    @staticmethod
+    def items_by_bill(bill_ids: List[int], chunk_size: int = 500) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Items of many bills as plain dicts (same shape as to_dict()), read from column rows
+        without hydrating Item objects. One SELECT per `chunk_size` bills (keeps the IN list
+        under SQLite's bound-parameter limit).
+        Returns: dict - {bill_id: [item dict, ...]}
+        """
+        items = {}
+        for start in range(0, len(bill_ids), chunk_size):
+            rows = db.session.query(
+                Item.id, Item.description, Item.quantity, Item.price, Item.bill_id
+            ).filter(Item.bill_id.in_(bill_ids[start:start + chunk_size])).order_by(Item.bill_id, Item.id).all()
+            for row in rows:
+                items.setdefault(row.bill_id, []).append({
+                    'id': row.id,
+                    'description': row.description,
+                    'quantity': row.quantity,
+                    'price': row.price,
+                    'bill_id': row.bill_id
+                })
+        return items
+
     @staticmethod
     def update_item(db, item_id: int, **kwargs) -> 'Item':
         """
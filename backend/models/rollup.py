@@ -0,0 +1,205 @@
+from datetime import datetime, date as date_type
+from decimal import Decimal
+from typing import List, Dict, Any, Optional
+from sqlalchemy.dialects import postgresql, sqlite
+from . import db
+
+
+class SpendDaily(db.Model):
+    __tablename__ = "spend_daily"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    bill_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class SpendMonthly(db.Model):
+    __tablename__ = "spend_monthly"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)  # first day of the month
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    bill_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class SpendMerchantMonthly(db.Model):
+    __tablename__ = "spend_merchant_monthly"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+    merchant_name = db.Column(db.String(255), primary_key=True)
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    bill_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+ROLLUP_MODELS = (SpendDaily, SpendMonthly, SpendMerchantMonthly)
+
+
+def truncate_date(column, granularity: str):
+    """
+    SQL expression truncating a date/timestamp column to the start of its day, week (Monday), month or year
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        if granularity == 'day':
+            return db.cast(column, db.Date)
+        return db.func.date_trunc(granularity, column)
+    if granularity == 'day':
+        return db.func.date(column)
+    if granularity == 'week':
+        # SQLite: 'weekday 0' moves forward to the next Sunday (or stays), six days back is that week's Monday
+        return db.func.date(column, 'weekday 0', '-6 days')
+    return db.func.strftime('%Y-%m-01' if granularity == 'month' else '%Y-01-01', column)
+
+
+def _upsert(model, keys: Dict[str, Any], amount: Decimal, count: int):
+    """
+    Add amount/count to one rollup row, creating it if needed, in a single statement so
+    concurrent uploads for the same user and day cannot race on the insert
+    """
+    dialect = db.session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    statement = insert(model).values(**keys, total=amount, bill_count=count)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={
+            'total': model.total + statement.excluded.total,
+            'bill_count': model.bill_count + statement.excluded.bill_count
+        }
+    )
+    db.session.execute(statement)
+
+
+def apply_bill_to_rollups(user_id: int, date: datetime, merchant_name: str, total_amount, sign: int = 1):
+    """
+    Add (sign=1) or remove (sign=-1) one bill from the user's rollups. Runs in the caller's
+    session and is committed, or rolled back, together with the bill itself.
+    """
+    amount = Decimal(str(total_amount)) * sign
+    day = date.date() if isinstance(date, datetime) else date
+    month = day.replace(day=1)
+    _upsert(SpendDaily, {'user_id': user_id, 'day': day}, amount, sign)
+    _upsert(SpendMonthly, {'user_id': user_id, 'month': month}, amount, sign)
+    _upsert(SpendMerchantMonthly, {'user_id': user_id, 'month': month, 'merchant_name': merchant_name}, amount, sign)
+    if sign < 0:
+        # Drop periods that no longer have any bills
+        for model in ROLLUP_MODELS:
+            db.session.query(model).filter(model.user_id == user_id, model.bill_count <= 0).delete(synchronize_session=False)
+
+
+def rebuild_rollups(user_id: Optional[int] = None) -> int:
+    """
+    Recompute the rollups from the bills table (all users, or one), e.g. for a backfill
+    Returns: int - number of bills covered
+    """
+    from models.bill import Bill  # models.bill imports this module
+
+    def scoped(query, model):
+        return query.filter(model.user_id == user_id) if user_id is not None else query
+
+    for model in ROLLUP_MODELS:
+        scoped(db.session.query(model), model).delete(synchronize_session=False)
+
+    day = truncate_date(Bill.date, 'day')
+    month = db.cast(truncate_date(Bill.date, 'month'), db.Date) if db.session.get_bind().dialect.name == 'postgresql' \
+        else truncate_date(Bill.date, 'month')
+    sources = [
+        (SpendDaily, ['user_id', 'day'], [Bill.user_id, day]),
+        (SpendMonthly, ['user_id', 'month'], [Bill.user_id, month]),
+        (SpendMerchantMonthly, ['user_id', 'month', 'merchant_name'], [Bill.user_id, month, Bill.merchant_name]),
+    ]
+    for model, names, group_by in sources:
+        select = scoped(db.session.query(
+            *group_by, db.func.sum(Bill.total_amount), db.func.count(Bill.id)
+        ), Bill).group_by(*group_by)
+        db.session.execute(model.__table__.insert().from_select(names + ['total', 'bill_count'], select))
+    db.session.commit()
+    return scoped(db.session.query(db.func.count(Bill.id)), Bill).scalar()
+
+
+def check_rollups(user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Compare every rollup table with the same aggregation over the raw bills table
+    Returns: list - one dict per mismatching row ({'table', 'key', 'expected', 'actual'}); empty when consistent
+    """
+    from models.bill import Bill
+
+    query = db.session.query(Bill.user_id, Bill.date, Bill.merchant_name, Bill.total_amount)
+    if user_id is not None:
+        query = query.filter(Bill.user_id == user_id)
+    expected = {model.__tablename__: {} for model in ROLLUP_MODELS}
+    for row in query.yield_per(1000):
+        day = row.date.date()
+        month = day.replace(day=1)
+        for table, key in (('spend_daily', (row.user_id, day)),
+                           ('spend_monthly', (row.user_id, month)),
+                           ('spend_merchant_monthly', (row.user_id, month, row.merchant_name))):
+            total, count = expected[table].get(key, (Decimal('0'), 0))
+            expected[table][key] = (total + Decimal(str(row.total_amount)), count + 1)
+
+    mismatches = []
+    for model, key_columns in ((SpendDaily, ('user_id', 'day')),
+                               (SpendMonthly, ('user_id', 'month')),
+                               (SpendMerchantMonthly, ('user_id', 'month', 'merchant_name'))):
+        table = model.__tablename__
+        rows = db.session.query(model)
+        if user_id is not None:
+            rows = rows.filter(model.user_id == user_id)
+        actual = {}
+        for row in rows:
+            key = tuple(getattr(row, column) for column in key_columns)
+            if isinstance(key[1], datetime):
+                key = (key[0], key[1].date()) + key[2:]
+            actual[key] = (Decimal(str(row.total)), row.bill_count)
+        for key in set(expected[table]) | set(actual):
+            want = expected[table].get(key, (Decimal('0'), 0))
+            have = actual.get(key, (Decimal('0'), 0))
+            if abs(want[0] - have[0]) >= Decimal('0.01') or want[1] != have[1]:
+                mismatches.append({
+                    'table': table,
+                    'key': [k.isoformat() if isinstance(k, date_type) else k for k in key],
+                    'expected': {'total': str(want[0]), 'bill_count': want[1]},
+                    'actual': {'total': str(have[0]), 'bill_count': have[1]}
+                })
+    return mismatches
+
+
+def spend_from_rollups(user_id: int, granularity: str, date_from: Optional[datetime] = None,
+                       date_to: Optional[datetime] = None, by_merchant: bool = False) -> Optional[List[Dict[str, Any]]]:
+    """
+    Same result as Bill.spend_by_period, read from the rollups instead of the bills.
+    Weeks and day-bounded ranges come from spend_daily; whole months and years from the
+    monthly tables. Returns None when the rollups cannot answer (a merchant breakdown
+    that needs day precision); the caller then aggregates the raw bills.
+    """
+    month_aligned = all(d is None or (d.day == 1 and d.time() == datetime.min.time()) for d in (date_from, date_to))
+    if by_merchant:
+        if granularity == 'week' or not month_aligned:
+            return None
+        model, column = SpendMerchantMonthly, SpendMerchantMonthly.month
+    elif granularity == 'week' or not month_aligned:
+        model, column = SpendDaily, SpendDaily.day
+    else:
+        model, column = SpendMonthly, SpendMonthly.month
+
+    period = truncate_date(column, granularity).label('period')
+    group_by = [period, model.merchant_name] if by_merchant else [period]
+    query = db.session.query(
+        *group_by,
+        db.func.sum(model.total).label('total'),
+        db.func.sum(model.bill_count).label('count')
+    ).filter(model.user_id == user_id)
+    if date_from is not None:
+        query = query.filter(column >= date_from.date())
+    if date_to is not None:
+        query = query.filter(column < date_to.date())
+    rows = query.group_by(*group_by).order_by(*group_by).all()
+
+    result = []
+    for row in rows:
+        key = row.period.date().isoformat() if isinstance(row.period, datetime) else str(row.period)[:10]
+        entry = {'period': key, 'total': round(float(row.total or 0), 2), 'count': int(row.count or 0)}
+        if by_merchant:
+            entry['merchant_name'] = row.merchant_name
+        result.append(entry)
+    return result
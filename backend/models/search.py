@@ -0,0 +1,213 @@
+import re
+from typing import List, Tuple
+from sqlalchemy import text
+from utils.logger import get_logger
+from . import db
+
+logger = get_logger(__name__)
+
+# Full-text index over bill merchants and item descriptions, one row per bill:
+#   PostgreSQL: bill_search(bill_id, user_id, document tsvector) with a GIN index on
+#               (user_id, document), so a search only visits the user's own entries;
+#               the merchant is weighted above the items.
+#   SQLite:     FTS5 virtual table bill_search(merchant_name, items, user_id) with rowid = bill id;
+#               user_id is an indexed column and part of every MATCH, so a search only
+#               reads the user's own postings.
+# Neither can be declared as a regular model, so the DDL lives here and runs from
+# ensure_search_index() at startup. Rows are written in the same transaction as the bill.
+
+PG_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS bill_search (
+        bill_id INTEGER PRIMARY KEY REFERENCES bills(id) ON DELETE CASCADE,
+        user_id INTEGER NOT NULL,
+        document TSVECTOR NOT NULL
+    )
+    """,
+]
+# A GIN index over (user_id, document) needs btree_gin for the integer column
+PG_USER_INDEX_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    "CREATE INDEX IF NOT EXISTS ix_bill_search_user_document ON bill_search USING GIN (user_id, document)",
+    "DROP INDEX IF EXISTS ix_bill_search_document",
+]
+# Without btree_gin (e.g. no privilege to create extensions): document only, user_id filtered after the match
+PG_DOCUMENT_INDEX_DDL = "CREATE INDEX IF NOT EXISTS ix_bill_search_document ON bill_search USING GIN (document)"
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS bill_search USING fts5(
+        merchant_name, items, user_id, tokenize = 'porter unicode61'
+    )
+    """,
+]
+
+# Set by ensure_search_index(); without an index (e.g. SQLite built without FTS5) writes are
+# skipped and searches fall back to a LIKE scan
+_index_available = False
+
+TERM = re.compile(r'\w+', re.UNICODE)
+MAX_TERMS = 8
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def ensure_search_index():
+    """
+    Create the search table and index if they don't exist (idempotent)
+    """
+    global _index_available
+    try:
+        for statement in (PG_DDL if _dialect() == 'postgresql' else SQLITE_DDL):
+            db.session.execute(text(statement))
+        db.session.commit()
+        if _dialect() == 'postgresql':
+            _ensure_pg_index()
+        _index_available = True
+        if _dialect() == 'sqlite':
+            _migrate_sqlite_index()
+    except Exception:
+        db.session.rollback()
+        _index_available = False
+        raise
+
+
+def _ensure_pg_index():
+    try:
+        for statement in PG_USER_INDEX_DDL:
+            db.session.execute(text(statement))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"btree_gin unavailable, search index is not per user: {str(e)}")
+        db.session.execute(text(PG_DOCUMENT_INDEX_DDL))
+        db.session.commit()
+
+
+def _migrate_sqlite_index():
+    # Tables created with user_id UNINDEXED can't filter by user inside MATCH; recreate and re-index them
+    ddl = db.session.execute(text("SELECT sql FROM sqlite_master WHERE name = 'bill_search'")).scalar() or ''
+    if 'UNINDEXED' not in ddl.upper():
+        return
+    logger.info("Recreating the bill_search FTS5 table with an indexed user_id column")
+    db.session.execute(text("DROP TABLE bill_search"))
+    for statement in SQLITE_DDL:
+        db.session.execute(text(statement))
+    rebuild_search_index()
+
+
+def query_terms(query: str) -> List[str]:
+    """
+    Words of a search query; each one is matched as a prefix and all must match
+    """
+    return [term.lower() for term in TERM.findall(query)][:MAX_TERMS]
+
+
+def contains_pattern(value: str) -> str:
+    """
+    LIKE pattern matching `value` anywhere, with its own % and _ taken literally (use with escape='\\')
+    """
+    escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def add_to_search_index(bill_id: int, user_id: int, merchant_name: str, item_descriptions: List[str]):
+    """
+    Add a bill to the search index in the caller's transaction
+    """
+    if not _index_available:
+        return
+    items = ' '.join(item_descriptions)
+    if _dialect() == 'postgresql':
+        db.session.execute(text(
+            "INSERT INTO bill_search (bill_id, user_id, document) VALUES (:bill_id, :user_id, "
+            "setweight(to_tsvector('english', :merchant), 'A') || setweight(to_tsvector('english', :items), 'B')) "
+            "ON CONFLICT (bill_id) DO UPDATE SET document = EXCLUDED.document"
+        ), {'bill_id': bill_id, 'user_id': user_id, 'merchant': merchant_name, 'items': items})
+    else:
+        db.session.execute(text("DELETE FROM bill_search WHERE rowid = :bill_id"), {'bill_id': bill_id})
+        db.session.execute(text(
+            "INSERT INTO bill_search (rowid, merchant_name, items, user_id) VALUES (:bill_id, :merchant, :items, :user_id)"
+        ), {'bill_id': bill_id, 'user_id': user_id, 'merchant': merchant_name, 'items': items})
+
+
+def remove_from_search_index(bill_id: int):
+    """
+    Drop a bill from the search index in the caller's transaction
+    """
+    if not _index_available:
+        return
+    if _dialect() == 'postgresql':
+        db.session.execute(text("DELETE FROM bill_search WHERE bill_id = :bill_id"), {'bill_id': bill_id})
+    else:
+        db.session.execute(text("DELETE FROM bill_search WHERE rowid = :bill_id"), {'bill_id': bill_id})
+
+
+def search_bill_ids(user_id: int, query: str, limit: int, offset: int = 0) -> List[Tuple[int, float]]:
+    """
+    Ranked ids of the user's bills matching every term of `query` (as a prefix), best first.
+    Matching runs on the index (GIN / FTS5), so cost follows the number of matches rather
+    than the size of the user's history.
+    Returns: list of (int, float) - (bill_id, score; higher is better)
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    params = {'user_id': user_id, 'limit': limit, 'offset': offset}
+    if not _index_available:
+        return _scan_bill_ids(user_id, terms, limit, offset)
+    if _dialect() == 'postgresql':
+        params['query'] = ' & '.join(f"{term}:*" for term in terms)
+        rows = db.session.execute(text(
+            "SELECT s.bill_id, ts_rank(s.document, q) AS score "
+            "FROM bill_search s JOIN bills b ON b.id = s.bill_id, to_tsquery('english', :query) q "
+            "WHERE s.user_id = :user_id AND s.document @@ q "
+            "ORDER BY score DESC, b.date DESC, s.bill_id DESC LIMIT :limit OFFSET :offset"
+        ), params)
+        return [(row.bill_id, float(row.score)) for row in rows]
+    # FTS5: quoted terms can't be parsed as operators. The user's terms are limited to the merchant
+    # and item columns and the user_id token narrows the match to the user's rows; bm25 is
+    # lower-is-better, merchant weighted 10x and user_id not at all
+    words = ' AND '.join(f'"{term}"*' for term in terms)
+    params['query'] = f'user_id : "{int(user_id)}" AND {{merchant_name items}} : ({words})'
+    rows = db.session.execute(text(
+        "SELECT rowid AS bill_id, bm25(bill_search, 10.0, 1.0, 0.0) AS rank FROM bill_search "
+        "WHERE bill_search MATCH :query "
+        "ORDER BY rank, rowid DESC LIMIT :limit OFFSET :offset"
+    ), params)
+    return [(row.bill_id, -float(row.rank)) for row in rows]
+
+
+def _scan_bill_ids(user_id: int, terms: List[str], limit: int, offset: int) -> List[Tuple[int, float]]:
+    # Unindexed fallback: every term must appear in the merchant name or in one of the items
+    from models.bill import Bill
+    from models.item import Item
+
+    query = db.session.query(Bill.id).filter(Bill.user_id == user_id)
+    for term in terms:
+        pattern = contains_pattern(term)
+        query = query.filter(db.or_(
+            Bill.merchant_name.ilike(pattern, escape='\\'),
+            Bill.items.any(Item.description.ilike(pattern, escape='\\'))
+        ))
+    rows = query.order_by(Bill.date.desc(), Bill.id.desc()).limit(limit).offset(offset).all()
+    return [(row.id, 0.0) for row in rows]
+
+
+def rebuild_search_index() -> int:
+    """
+    Re-index every bill (backfill for bills created before the index existed)
+    Returns: int - number of bills indexed
+    """
+    from models.bill import Bill
+    from models.item import Item
+
+    db.session.execute(text("DELETE FROM bill_search"))
+    bills = db.session.query(Bill.id, Bill.user_id, Bill.merchant_name).all()
+    items = Item.items_by_bill([bill.id for bill in bills])
+    for bill in bills:
+        add_to_search_index(bill.id, bill.user_id, bill.merchant_name,
+                            [item['description'] for item in items.get(bill.id, [])])
+    db.session.commit()
+    return len(bills)
@@ -1,6 +1,31 @@
 from datetime import datetime, timedelta
+from sqlalchemy import inspect, text
 from . import db
 
+# Columns added after the uploads table was first created; db.create_all() does not alter
+# existing tables, so ensure_upload_columns() adds any that are missing at startup
+ADDED_COLUMNS = [
+    ('stage', 'VARCHAR(50)'),
+    ('bill_id', 'INTEGER REFERENCES bills(id) ON DELETE SET NULL'),
+    ('error_message', 'VARCHAR(512)'),
+]
+
+
+def ensure_upload_columns():
+    """
+    Add the background-job columns to an existing uploads table (idempotent)
+    """
+    existing = {column['name'] for column in inspect(db.engine).get_columns('uploads')}
+    try:
+        for name, ddl in ADDED_COLUMNS:
+            if name not in existing:
+                db.session.execute(text(f"ALTER TABLE uploads ADD COLUMN {name} {ddl}"))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
 class Upload(db.Model):
     __tablename__ = 'uploads'
     
@@ -10,14 +35,39 @@ class Upload(db.Model):
     upload_date = db.Column(db.DateTime(timezone=True), default=db.func.current_timestamp())
     file_size = db.Column(db.Integer, nullable=False)  # Size in bytes
     status = db.Column(db.String(50), default='completed')  # completed, failed, processing
+    stage = db.Column(db.String(50), nullable=True)  # queued, extracting, saving, archiving (background jobs)
+    bill_id = db.Column(db.Integer, db.ForeignKey('bills.id', ondelete='SET NULL'), nullable=True)
+    error_message = db.Column(db.String(512), nullable=True)  # Why a job failed, or a warning on a completed one
     
     # Relationships
     user = db.relationship('User', backref=db.backref('uploads', lazy=True))
     
-    def __init__(self, user_id, filename, file_size):
+    def __init__(self, user_id, filename, file_size, status='completed'):
         self.user_id = user_id
         self.filename = filename
         self.file_size = file_size
+        self.status = status
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'filename': self.filename,
+            'file_size': self.file_size,
+            'status': self.status,
+            'stage': self.stage,
+            'bill_id': self.bill_id,
+            'error': self.error_message if self.status == 'failed' else None,
+            # e.g. the bill was saved but its image could not be archived
+            'warning': self.error_message if self.status != 'failed' else None,
+            'upload_date': self.upload_date.isoformat() if self.upload_date else None
+        }
+
+    @staticmethod
+    def get_upload(upload_id: int) -> 'Upload':
+        """
+        Get an upload (job) by ID
+        """
+        return db.session.query(Upload).filter(Upload.id == upload_id).first()
     
     @staticmethod
     def get_user_upload_count(user_id: int, time_window: int = 24) -> int:
@@ -27,7 +77,8 @@ class Upload(db.Model):
         cutoff_time = datetime.utcnow() - timedelta(hours=time_window)
         return db.session.query(Upload).filter(
             Upload.user_id == user_id,
-            Upload.upload_date >= cutoff_time
+            Upload.upload_date >= cutoff_time,
+            Upload.status != 'failed'
         ).count()
     
     @staticmethod
@@ -36,7 +87,8 @@ class Upload(db.Model):
         Get the total number of uploads for a user
         """
         return db.session.query(Upload).filter(
-            Upload.user_id == user_id
+            Upload.user_id == user_id,
+            Upload.status != 'failed'
         ).count()
     
     @staticmethod
@@ -47,6 +99,7 @@ class Upload(db.Model):
         cutoff_time = datetime.utcnow() - timedelta(hours=time_window)
         result = db.session.query(db.func.sum(Upload.file_size)).filter(
             Upload.user_id == user_id,
-            Upload.upload_date >= cutoff_time
+            Upload.upload_date >= cutoff_time,
+            Upload.status != 'failed'
         ).scalar()
         return result or 0 
\ No newline at end of file
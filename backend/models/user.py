@@ -4,6 +4,8 @@ from typing import List, Dict, Any
 from . import db
 from models.bill import Bill
 from models.item import Item
+from models.rollup import apply_bill_to_rollups
+from models.search import add_to_search_index
 import secrets
 import string
 
@@ -74,7 +76,11 @@ class User(db.Model):
                     bill_id=bill.id
                 )
                 db.session.add(item)
-            
+
+            # Rollups and the search index are updated in the same transaction as the bill
+            apply_bill_to_rollups(user_id, date, bill.merchant_name, bill.total_amount)
+            add_to_search_index(bill.id, user_id, bill.merchant_name, [item['name'] for item in financial_data['items']])
+
             db.session.commit()
             db.session.refresh(bill)
             
@@ -0,0 +1,93 @@
+from flask import Blueprint, jsonify, request
+from models.bill import Bill
+from models.rollup import spend_from_rollups
+from utils.auth import token_required
+from utils.logger import get_logger
+from utils.cache_decorator import redis_cache
+from utils.pagination import parse_date_param
+from datetime import timedelta
+from config import ANALYTICS_CACHE_TTL, ANALYTICS_USE_ROLLUPS
+
+logger = get_logger(__name__)
+analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
+
+GRANULARITIES = ('week', 'month', 'year')
+SPEND_PARAMS = ('granularity', 'from', 'to', 'breakdown')
+
+def spend_cache_key(current_user):
+    params = ':'.join(request.args.get(name, '') for name in SPEND_PARAMS)
+    return f"user_analytics_{current_user.id}:spend:{params}"
+
+@analytics_bp.route('/spend', methods=['GET'])
+@token_required
+@redis_cache(spend_cache_key, timeout=ANALYTICS_CACHE_TTL, stale_ttl=ANALYTICS_CACHE_TTL // 2)
+def get_spend(current_user):
+    """
+    Spend totals per period for the dashboard charts:
+    ?granularity=week|month|year&from=YYYY-MM-DD&to=YYYY-MM-DD&breakdown=merchant
+    Periods are labelled by their first day (weeks start on Monday); 'to' is inclusive.
+    """
+    try:
+        granularity = request.args.get('granularity', 'month').lower()
+        if granularity not in GRANULARITIES:
+            return jsonify({'message': f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+        breakdown = request.args.get('breakdown')
+        if breakdown and breakdown != 'merchant':
+            return jsonify({'message': "breakdown must be 'merchant'"}), 400
+        try:
+            date_from = parse_date_param(request.args.get('from'))
+            date_to = parse_date_param(request.args.get('to'))
+        except ValueError:
+            return jsonify({'message': 'Dates must be in YYYY-MM-DD format'}), 400
+        if date_to is not None:
+            date_to += timedelta(days=1)
+
+        logger.info(f"Spend analytics requested by user {current_user.id}: {dict(request.args)}")
+        rows = None
+        if ANALYTICS_USE_ROLLUPS:
+            rows = spend_from_rollups(
+                current_user.id,
+                granularity,
+                date_from=date_from,
+                date_to=date_to,
+                by_merchant=breakdown == 'merchant'
+            )
+        if rows is None:
+            rows = Bill.spend_by_period(
+                current_user.id,
+                granularity,
+                date_from=date_from,
+                date_to=date_to,
+                by_merchant=breakdown == 'merchant'
+            )
+
+        series = []
+        for row in rows:
+            if not series or series[-1]['period'] != row['period']:
+                series.append({'period': row['period'], 'total': 0.0, 'count': 0})
+            entry = series[-1]
+            entry['total'] = round(entry['total'] + row['total'], 2)
+            entry['count'] += row['count']
+            if breakdown:
+                entry.setdefault('merchants', []).append({
+                    'merchant_name': row['merchant_name'],
+                    'total': row['total'],
+                    'count': row['count']
+                })
+        for entry in series:
+            if breakdown:
+                entry['merchants'].sort(key=lambda merchant: merchant['total'], reverse=True)
+
+        return jsonify({
+            'message': 'Spend retrieved successfully',
+            'granularity': granularity,
+            'from': request.args.get('from'),
+            'to': request.args.get('to'),
+            'total': round(sum(entry['total'] for entry in series), 2),
+            'count': sum(entry['count'] for entry in series),
+            'series': series
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Spend analytics error for user {current_user.id}: {str(e)}")
+        return jsonify({'message': 'Internal server error', 'error': str(e)}), 500
@@ -1,28 +1,41 @@
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, jsonify, current_app, request
 from models.bill import Bill
 from models.item import Item
 from models.user import db
 from utils.auth import token_required
 from utils.logger import get_logger
-from utils.cache_decorator import redis_cache
-import redis
+from utils.cache_decorator import redis_cache, bump_user_cache_generation
+from utils.pagination import encode_cursor, decode_cursor, parse_date_param
+from datetime import timedelta
+import hashlib
 import json
-from config import REDIS_URL
+from config import BILLS_PAGE_MAX_LIMIT
 
 logger = get_logger(__name__)
 bills_bp = Blueprint('bills', __name__, url_prefix='/api')
 
-# Create a Redis client
-redis_client = redis.Redis.from_url(REDIS_URL)
+PAGE_PARAMS = ('limit', 'cursor', 'from', 'to', 'merchant')
+
+def bills_cache_key(current_user):
+    """
+    The full list keeps its original key; every page/filter combination is cached under its own key
+    (redis_cache adds the user's cache generation)
+    """
+    params = [(name, request.args.get(name, '')) for name in PAGE_PARAMS if request.args.get(name)]
+    if not params:
+        return f"user_bills_{current_user.id}"
+    digest = hashlib.sha1(json.dumps(params).encode()).hexdigest()[:16]
+    return f"user_bills_{current_user.id}:{digest}"
 
 @bills_bp.route('/bills', methods=['GET'])
 @token_required
-@redis_cache(lambda current_user: f"user_bills_{current_user.id}", timeout=120)
+@redis_cache(bills_cache_key, timeout=120, stale_ttl=60, etag=True)
 def get_user_bills(current_user):
     try:
+        if any(request.args.get(name) for name in PAGE_PARAMS):
+            return get_user_bills_page(current_user)
         logger.info(f"Bills requested by user {current_user.id}")
-        bills = Bill.get_user_bills(current_user.id)
-        bills_data = [bill.to_dict() for bill in bills]
+        bills_data = Bill.get_user_bills_data(current_user.id)
         logger.info(f"Bills retrieved successfully for user {current_user.id}, count: {len(bills_data)}")
         return jsonify({
             'message': 'Bills retrieved successfully',
@@ -33,6 +46,47 @@ def get_user_bills(current_user):
         logger.error(f"Bills retrieval error for user {current_user.id}: {str(e)}")
         return jsonify({'message': 'Internal server error', 'error': str(e)}), 500
 
+def get_user_bills_page(current_user):
+    """
+    Paginated, filtered variant of GET /bills: ?limit=&cursor=&from=YYYY-MM-DD&to=YYYY-MM-DD&merchant=
+    Bills are ordered newest first by (date, id); pass next_cursor back as cursor for the next page.
+    """
+    try:
+        limit = int(request.args.get('limit', BILLS_PAGE_MAX_LIMIT))
+        if limit < 1 or limit > BILLS_PAGE_MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return jsonify({'message': f'limit must be between 1 and {BILLS_PAGE_MAX_LIMIT}'}), 400
+    try:
+        after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({'message': 'Invalid cursor'}), 400
+    try:
+        date_from = parse_date_param(request.args.get('from'))
+        date_to = parse_date_param(request.args.get('to'))
+    except ValueError:
+        return jsonify({'message': 'Dates must be in YYYY-MM-DD format'}), 400
+    if date_to is not None:
+        # 'to' is inclusive of the whole day
+        date_to += timedelta(days=1)
+
+    logger.info(f"Bills page requested by user {current_user.id}: {dict(request.args)}")
+    bills_data, next_after = Bill.get_user_bills_page(
+        current_user.id,
+        limit,
+        after=after,
+        date_from=date_from,
+        date_to=date_to,
+        merchant=request.args.get('merchant')
+    )
+    logger.info(f"Bills page retrieved for user {current_user.id}, count: {len(bills_data)}")
+    return jsonify({
+        'message': 'Bills retrieved successfully',
+        'bills': bills_data,
+        'next_cursor': encode_cursor(next_after),
+        'has_more': next_after is not None
+    }), 200
+
 @bills_bp.route('/bills/<int:bill_id>', methods=['DELETE'])
 @token_required
 def delete_bill(current_user, bill_id):
@@ -53,11 +107,9 @@ def delete_bill(current_user, bill_id):
         # Delete the bill
         success = Bill.delete_bill(db, bill_id)
         if success:
-            # Clear cache for this user's bills
+            # Invalidate every cached view of this user, including this bill's items
             try:
-                cache_key = f"user_bills_{current_user.id}"
-                redis_client.delete(cache_key)
-                logger.info(f"Cache cleared for user {current_user.id}")
+                bump_user_cache_generation(current_user.id)
             except Exception as cache_error:
                 logger.warning(f"Failed to clear cache for user {current_user.id}: {str(cache_error)}")
             
@@ -73,18 +125,19 @@ def delete_bill(current_user, bill_id):
 
 @bills_bp.route('/bills/<int:bill_id>/items', methods=['GET'])
 @token_required
-@redis_cache(lambda current_user, bill_id: f"bill_items_{current_user.id}_{bill_id}", timeout=120)
+@redis_cache(lambda current_user, bill_id: f"bill_items_{current_user.id}_{bill_id}", timeout=120, stale_ttl=60, etag=True)
 def get_bill_items(current_user, bill_id):
     try:
         logger.info(f"Bill items requested for bill_id {bill_id} by user {current_user.id}")
-        bill = Bill.get_bill(bill_id)
-        if not bill:
+        # Only the owner column is needed for the check; items are read as plain rows
+        owner_id = Bill.get_bill_owner(bill_id)
+        if owner_id is None:
             logger.info(f"Bill not found: {bill_id} for user {current_user.id}")
             return jsonify({'message': 'Bill not found'}), 404
-        if bill.user_id != current_user.id:
+        if owner_id != current_user.id:
             logger.info(f"Unauthorized bill access attempt: bill_id {bill_id} by user {current_user.id}")
             return jsonify({'message': 'Unauthorized access to bill'}), 403
-        items_data = [item.to_dict() for item in bill.items]
+        items_data = Item.items_by_bill([bill_id]).get(bill_id, [])
         logger.info(f"Items retrieved for bill_id {bill_id} by user {current_user.id}, count: {len(items_data)}")
         return jsonify({
             'message': 'Items retrieved successfully',
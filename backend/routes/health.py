@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify
 from utils.logger import get_logger
+from utils.metrics import collect_metrics
 
 logger = get_logger(__name__)
 health_bp = Blueprint('health', __name__)
@@ -12,3 +13,11 @@ def health():
     except Exception as e:
         logger.error(f"Health check error: {str(e)}")
         return jsonify({'status': 'error', 'error': str(e)}), 500
+
+@health_bp.route('/metrics', methods=['GET'])
+def metrics():
+    try:
+        return jsonify(collect_metrics()), 200
+    except Exception as e:
+        logger.error(f"Metrics error: {str(e)}")
+        return jsonify({'status': 'error', 'error': str(e)}), 500
@@ -0,0 +1,62 @@
+from flask import Blueprint, jsonify, request
+from models.bill import Bill
+from models.search import search_bill_ids, query_terms
+from utils.auth import token_required
+from utils.logger import get_logger
+from utils.cache_decorator import redis_cache
+from config import SEARCH_MAX_LIMIT
+import hashlib
+
+logger = get_logger(__name__)
+search_bp = Blueprint('search', __name__, url_prefix='/api')
+
+def search_cache_key(current_user):
+    params = '\x00'.join(request.args.get(name, '') for name in ('q', 'limit', 'offset'))
+    return f"user_search_{current_user.id}:{hashlib.sha1(params.encode()).hexdigest()[:16]}"
+
+@search_bp.route('/search', methods=['GET'])
+@token_required
+@redis_cache(search_cache_key, timeout=60)
+def search_bills(current_user):
+    """
+    Full-text search over the user's merchants and item descriptions: ?q=&limit=&offset=
+    Every word must match (as a prefix); results are ranked best first, merchant matches above item matches.
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        if not query_terms(query):
+            return jsonify({'message': 'Query parameter q is required'}), 400
+        try:
+            limit = int(request.args.get('limit', 20))
+            offset = int(request.args.get('offset', 0))
+            if limit < 1 or limit > SEARCH_MAX_LIMIT or offset < 0:
+                raise ValueError
+        except ValueError:
+            return jsonify({'message': f'limit must be between 1 and {SEARCH_MAX_LIMIT} and offset non-negative'}), 400
+
+        logger.info(f"Search requested by user {current_user.id}: {query}")
+        # One extra match tells whether another page exists
+        matches = search_bill_ids(current_user.id, query, limit + 1, offset)
+        has_more = len(matches) > limit
+        matches = matches[:limit]
+
+        scores = dict(matches)
+        order = {bill_id: position for position, (bill_id, _) in enumerate(matches)}
+        bills = Bill.rows_to_dicts(Bill.query.filter(Bill.id.in_(list(scores)), Bill.user_id == current_user.id))
+        bills.sort(key=lambda bill: order[bill['id']])
+        for bill in bills:
+            bill['score'] = round(scores[bill['id']], 4)
+
+        logger.info(f"Search for user {current_user.id} returned {len(bills)} bills")
+        return jsonify({
+            'message': 'Search completed successfully',
+            'query': query,
+            'results': bills,
+            'limit': limit,
+            'offset': offset,
+            'has_more': has_more
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Search error for user {current_user.id}: {str(e)}")
+        return jsonify({'message': 'Internal server error', 'error': str(e)}), 500
@@ -1,55 +1,135 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, url_for
 from models.upload import Upload
-from models.user import User, db
+from models.user import db
 from models.bill import Bill
 from utils.auth import token_required
 from utils.logger import get_logger
-from config import MAX_TOTAL_UPLOADS, MAX_UPLOADS_PER_DAY, MAX_TOTAL_SIZE_PER_DAY, MAX_FILE_SIZE
+from config import MAX_TOTAL_UPLOADS, MAX_UPLOADS_PER_DAY, MAX_TOTAL_SIZE_PER_DAY, MAX_FILE_SIZE, UPLOAD_ASYNC_MODE, UPLOAD_IN_MEMORY, MAX_BATCH_FILES, OCR_BACKEND_PER_REQUEST
 from werkzeug.utils import secure_filename
+import io
 import os
-from utils.data_extraction import DataExtractor
-from utils.ai_services import AIServices
+import uuid
+from utils.data_extraction import DataExtractor, available_ocr_backends
 from sqlalchemy.exc import IntegrityError
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from utils.cache_decorator import redis_cache
+from utils.upload_pipeline import process_bill_file, process_bill_batch, discard_source
+from utils.upload_jobs import submit_upload_job
 
 
 logger = get_logger(__name__)
 upload_bp = Blueprint('upload', __name__, url_prefix='/api')
 
-# Initialize data extractor and AI services
-data_extractor = DataExtractor()
-ai_services = AIServices()
-
 # Use the limiter from the main app
 limiter = Limiter(key_func=get_remote_address)
 
-def check_upload_limits(user_id):
+def check_upload_limits(user_id, file_count=1, batch_size=0):
     """
     Check if user has exceeded upload limits
+    For a batch, file_count and batch_size cover every file so the limits are evaluated once
     Returns: (bool, str) - (is_allowed, error_message)
     """
+    batch = f"Batch of {file_count} files exceeds the " if file_count > 1 else ""
+
     # Check total uploads
     total_uploads = Upload.get_user_total_uploads(user_id)
-    if total_uploads >= MAX_TOTAL_UPLOADS:
+    if total_uploads + file_count > MAX_TOTAL_UPLOADS:
+        if batch:
+            return False, f"{batch}total upload limit of {MAX_TOTAL_UPLOADS} files"
         return False, f"Total upload limit of {MAX_TOTAL_UPLOADS} files reached"
     
     # Check daily uploads
     daily_uploads = Upload.get_user_upload_count(user_id)
-    if daily_uploads >= MAX_UPLOADS_PER_DAY:
+    if daily_uploads + file_count > MAX_UPLOADS_PER_DAY:
+        if batch:
+            return False, f"{batch}daily upload limit of {MAX_UPLOADS_PER_DAY} files"
         return False, f"Daily upload limit of {MAX_UPLOADS_PER_DAY} files reached"
     
     # Check total size
     total_size = Upload.get_user_total_size(user_id)
     if total_size >= MAX_TOTAL_SIZE_PER_DAY:
         return False, f"Daily storage limit of {MAX_TOTAL_SIZE_PER_DAY/1024/1024}MB reached"
+    if batch and total_size + batch_size > MAX_TOTAL_SIZE_PER_DAY:
+        return False, f"{batch}daily storage limit of {MAX_TOTAL_SIZE_PER_DAY/1024/1024}MB"
     
     return True, None
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS'].split(',')
 
+def wants_async_upload():
+    """
+    Job mode is requested with ?async=true (or an 'async' form field); UPLOAD_ASYNC_MODE sets the default
+    """
+    value = request.args.get('async', request.form.get('async'))
+    if value is None:
+        return UPLOAD_ASYNC_MODE
+    return value.lower() in ('1', 'true', 'yes')
+
+def requested_ocr_backend():
+    """
+    OCR engine chosen with an 'ocr_backend' form field (or query parameter), if per-request selection is enabled
+    Returns: (str, str) - (backend name or None for the deployment default, error_message)
+    """
+    value = request.form.get('ocr_backend', request.args.get('ocr_backend'))
+    if not value or not OCR_BACKEND_PER_REQUEST:
+        return None, None
+    value = value.lower()
+    if value not in available_ocr_backends():
+        return None, f"OCR backend '{value}' is not available"
+    return value, None
+
+def stage_upload(file, filename):
+    """
+    Returns the in-memory request buffer when UPLOAD_IN_MEMORY is enabled (zero-disk path),
+    otherwise saves the file into UPLOAD_FOLDER and returns its path
+    """
+    if UPLOAD_IN_MEMORY and isinstance(file.stream, io.BytesIO):
+        file.stream.seek(0)
+        return file.stream
+    # Prefix with a random token so concurrent uploads of the same name don't collide
+    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{filename}")
+    file.save(file_path)
+    return file_path
+
+def enqueue_upload(current_user, source, filename, file_size, content_type, ocr_backend=None):
+    """
+    Record a 'processing' upload and hand the staged file to the background workers.
+    The temporary file is owned (and removed) by the job from here on.
+    """
+    if not isinstance(source, str):
+        # The request buffer is closed at teardown; give the job its own view of the bytes
+        source = io.BytesIO(source.getvalue())
+    try:
+        upload = Upload(
+            user_id=current_user.id,
+            filename=filename,
+            file_size=file_size,
+            status='processing'
+        )
+        upload.stage = 'queued'
+        db.session.add(upload)
+        db.session.commit()
+        submit_upload_job(
+            current_app._get_current_object(),
+            upload.id,
+            current_user.id,
+            source,
+            content_type,
+            ocr_backend
+        )
+    except Exception:
+        discard_source(source)
+        raise
+    logger.info(f"Upload job {upload.id} queued for user {current_user.id}: {filename}")
+    return jsonify({
+        'message': 'File accepted for processing',
+        'job_id': upload.id,
+        'status': upload.status,
+        'status_url': url_for('upload.get_upload_status', job_id=upload.id)
+    }), 202
+
 @upload_bp.route('/upload', methods=['POST'])
 @token_required
 @limiter.limit("10/day")
@@ -82,59 +162,40 @@ def upload_file(current_user):
             logger.info(f"Upload failed: {error_message} for user {current_user.id}")
             return jsonify({'message': error_message}), 400
 
+        ocr_backend, error_message = requested_ocr_backend()
+        if error_message:
+            logger.info(f"Upload failed: {error_message} for user {current_user.id}")
+            return jsonify({'message': error_message}), 400
+
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
+            source = stage_upload(file, filename)
+            logger.info(f"File staged for user {current_user.id}: {filename}")
 
-            logger.info(f"File saved temporarily for user {current_user.id}: {filename}")
+            if wants_async_upload():
+                return enqueue_upload(current_user, source, filename, file_size, file.content_type, ocr_backend)
 
             try:
-                data_extractor = DataExtractor()
-                # Extract data from the image
-                result = data_extractor.extract_text_from_file(file_path)
-                # Upload the image to S3 after extraction
-                # data_extractor.upload_image_to_s3(
-                #     file_path,
-                #     bucket_name=S3_BUCKET_NAME,
-                #     user_id=current_user.id,
-                #     content_type=file.content_type
-                # )
-                # logger.info(f"Image uploaded to S3 for user {current_user.id}: {filename}")
-                # Save the extracted data to database
                 try:
-                    bill = User.save_extracted_data(db, current_user.id, result['analysis'])
+                    bill, s3_error = process_bill_file(current_user.id, source, file.content_type, ocr_backend=ocr_backend)
                 except IntegrityError as ie:
                     db.session.rollback()
                     logger.error(f"Duplicate bill detected for user {current_user.id}: {str(ie)}")
                     return jsonify({'message': 'Duplicate bill not allowed. This bill already exists. Please upload a different bill.'}), 409
-                logger.info(f"Extracted data saved to DB for user {current_user.id}, bill id: {bill.id}")
-                # Upload the image to S3 with username_billid as key
-                user_obj = User.query.get(current_user.id)
-                s3_upload_success = DataExtractor.upload_image_to_s3(
-                    file_path,
-                    bucket_name=os.environ.get('S3_BUCKET_NAME', 'spendlytic'),
-                    user_id=user_obj.username + f'_{bill.id}',
-                    content_type=file.content_type,
-                    folder="uploads"
-                )
-                if s3_upload_success is None:
-                    logger.error(f"Failed to upload image to S3 for user {current_user.id}, bill id: {bill.id}")
-                    return jsonify({'message': 'Failed to upload image to S3.'}), 500
-                bill.s3_key = s3_upload_success
-                db.session.commit()
-                # Invalidate bills cache for this user
-                cache_key = f"user_bills_{current_user.id}"
-                current_app.redis_client.delete(cache_key)
-                # Create upload record only after successful bill creation
+                # Create upload record only after successful bill creation; the bill is saved even
+                # when archival failed, so the upload counts toward the quota either way
                 upload = Upload(
                     user_id=current_user.id,
                     filename=filename,
                     file_size=file_size
                 )
+                upload.bill_id = bill.id
+                upload.error_message = s3_error
                 db.session.add(upload)
                 db.session.commit()
                 logger.info(f"Upload record created for user {current_user.id}: {filename}")
+                if s3_error:
+                    return jsonify({'message': s3_error}), 500
                 return jsonify({
                     'message': 'File uploaded and processed successfully',
                     'filename': filename,
@@ -148,9 +209,7 @@ def upload_file(current_user):
                 }), 500
             finally:
                 # Clean up the file
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    logger.info(f"Temporary file deleted: {file_path}")
+                discard_source(source)
 
         return jsonify({'message': 'File type not allowed'}), 400
 
@@ -158,10 +217,100 @@ def upload_file(current_user):
         logger.error(f"Upload error for user {current_user.id}: {str(e)}")
         return jsonify({'message': 'Internal server error', 'error': str(e)}), 500 
 
+@upload_bp.route('/upload/batch', methods=['POST'])
+@token_required
+@limiter.limit("10/day")
+def upload_batch(current_user):
+    try:
+        files = [file for file in request.files.getlist('files') if file.filename]
+        if not files:
+            logger.info(f"Batch upload failed: No files selected by user {current_user.id}")
+            return jsonify({'message': 'No files selected'}), 400
+        if len(files) > MAX_BATCH_FILES:
+            logger.info(f"Batch upload failed: {len(files)} files sent by user {current_user.id}")
+            return jsonify({'message': f'A batch may contain at most {MAX_BATCH_FILES} files'}), 400
+
+        ocr_backend, error_message = requested_ocr_backend()
+        if error_message:
+            logger.info(f"Batch upload failed: {error_message} for user {current_user.id}")
+            return jsonify({'message': error_message}), 400
+
+        # Per-file validation; rejected files are reported without failing the batch
+        results = [None] * len(files)
+        accepted = []
+        for index, file in enumerate(files):
+            filename = secure_filename(file.filename)
+            file.seek(0, os.SEEK_END)
+            file_size = file.tell()
+            file.seek(0)
+            if not allowed_file(file.filename):
+                results[index] = {'filename': filename, 'status': 'error', 'message': 'File type not allowed'}
+            elif file_size > MAX_FILE_SIZE:
+                results[index] = {'filename': filename, 'status': 'error', 'message': f'File size exceeds maximum limit of {MAX_FILE_SIZE/1024/1024}MB'}
+            else:
+                accepted.append((index, file, filename, file_size))
+
+        if accepted:
+            # Check upload limits once for the whole batch
+            is_allowed, error_message = check_upload_limits(
+                current_user.id,
+                file_count=len(accepted),
+                batch_size=sum(file_size for _, _, _, file_size in accepted)
+            )
+            if not is_allowed:
+                logger.info(f"Batch upload failed: {error_message} for user {current_user.id}")
+                return jsonify({'message': error_message}), 400
+
+            entries = [
+                (filename, stage_upload(file, filename), file_size, file.content_type)
+                for _, file, filename, file_size in accepted
+            ]
+            logger.info(f"Batch of {len(entries)} files staged for user {current_user.id}")
+            processed = process_bill_batch(current_app._get_current_object(), current_user.id, entries, ocr_backend)
+            for (index, _, _, _), result in zip(accepted, processed):
+                results[index] = result
+
+        summary = {status: sum(1 for r in results if r['status'] == status) for status in ('success', 'duplicate', 'error')}
+        logger.info(f"Batch upload finished for user {current_user.id}: {summary}")
+        return jsonify({
+            'message': 'Batch processed',
+            'summary': summary,
+            'results': results
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Batch upload error for user {current_user.id}: {str(e)}")
+        return jsonify({'message': 'Internal server error', 'error': str(e)}), 500
+
+@upload_bp.route('/upload/<int:job_id>', methods=['GET'])
+@token_required
+def get_upload_status(current_user, job_id):
+    try:
+        upload = Upload.get_upload(job_id)
+        if not upload or upload.user_id != current_user.id:
+            logger.info(f"Upload job not found: {job_id} for user {current_user.id}")
+            return jsonify({'message': 'Upload job not found'}), 404
+        job = upload.to_dict()
+        if upload.status == 'completed' and upload.bill_id:
+            bill = Bill.get_bill(upload.bill_id)
+            job['data'] = bill.to_dict() if bill else None
+        return jsonify(job), 200
+    except Exception as e:
+        logger.error(f"Upload status error for job {job_id} by user {current_user.id}: {str(e)}")
+        return jsonify({'message': 'Internal server error', 'error': str(e)}), 500
+
+# Signed preview URLs live for PREVIEW_URL_EXPIRATION seconds (generate_presigned_url caps
+# this at 600). A cached URL can be up to PREVIEW_URL_CACHE_TTL + PREVIEW_URL_STALE_TTL old
+# when served (plus the seconds-long L1 TTL), which leaves it about 240 s of validity.
+PREVIEW_URL_EXPIRATION = 600
+PREVIEW_URL_CACHE_TTL = 240
+PREVIEW_URL_STALE_TTL = 120
+
 # New endpoint to get signed S3 URL for bill preview
 @upload_bp.route('/bill/<int:bill_id>/preview-url', methods=['GET'])
 @token_required
-@redis_cache(lambda current_user, bill_id: f"signed_url_{current_user.id}_{bill_id}", timeout=600)
+@redis_cache(lambda current_user, bill_id: f"signed_url_{current_user.id}_{bill_id}",
+             timeout=PREVIEW_URL_CACHE_TTL, stale_ttl=PREVIEW_URL_STALE_TTL)
 def get_bill_preview_url(current_user, bill_id):
     bill = Bill.get_bill(bill_id)
     if not bill or bill.user_id != current_user.id:
@@ -169,7 +318,7 @@ def get_bill_preview_url(current_user, bill_id):
     if not bill.s3_key:
         return {'message': 'No image available for this bill'}, 404
     bucket_name = os.environ.get('S3_BUCKET_NAME', 'spendlytic')
-    expiration = 600
+    expiration = PREVIEW_URL_EXPIRATION
     signed_url = DataExtractor.generate_presigned_url(bucket_name, bill.s3_key, expiration=expiration)
     if not signed_url:
         return {'message': 'Failed to generate signed URL'}, 500
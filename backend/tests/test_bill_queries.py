@@ -0,0 +1,91 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import event
+from models import db
+from models.bill import Bill
+from models.item import Item
+
+ITEMS_PER_BILL = 12
+
+
+def add_bills(user_id, count):
+    bills = [Bill(merchant_name=f"Merchant {i}", total_amount=Decimal('10.00') + i, user_id=user_id,
+                  date=datetime(2024, 1, 1) + timedelta(days=i))
+             for i in range(count)]
+    db.session.add_all(bills)
+    db.session.flush()
+    db.session.add_all([Item(description=f"Item {j}", quantity=1, price=Decimal('1.50'), bill_id=bill.id)
+                        for bill in bills for j in range(ITEMS_PER_BILL)])
+    db.session.commit()
+    db.session.expunge_all()
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def test_bill_list_query_count_does_not_grow_with_bills(app):
+    add_bills(user_id=1, count=1)
+    add_bills(user_id=2, count=50)
+
+    with count_statements() as one:
+        single = Bill.get_user_bills_data(1)
+    with count_statements() as many:
+        bills = Bill.get_user_bills_data(2)
+
+    assert len(single) == 1 and len(bills) == 50
+    assert sum(len(bill['items']) for bill in bills) == 50 * ITEMS_PER_BILL
+    assert len(one) == len(many) == 2
+
+
+def test_bill_page_query_count_does_not_grow_with_limit(app):
+    add_bills(user_id=1, count=50)
+
+    with count_statements() as small:
+        page, _ = Bill.get_user_bills_page(1, limit=1)
+    with count_statements() as large:
+        full_page, next_after = Bill.get_user_bills_page(1, limit=50)
+
+    assert len(page) == 1 and len(full_page) == 50 and next_after is None
+    assert all(len(bill['items']) == ITEMS_PER_BILL for bill in full_page)
+    assert len(small) == len(large) == 2
+
+
+def test_items_by_bill_chunks_the_in_list(app):
+    add_bills(user_id=1, count=520)
+    bill_ids = [bill_id for (bill_id,) in db.session.query(Bill.id).all()]
+
+    with count_statements() as statements:
+        items = Item.items_by_bill(bill_ids)
+
+    # 520 ids: one SELECT for the first 500, one for the rest
+    assert len(statements) == 2
+    assert sorted(items) == sorted(bill_ids)
+    assert sum(len(bill_items) for bill_items in items.values()) == 520 * ITEMS_PER_BILL
+    assert all(item['bill_id'] == bill_id for bill_id, bill_items in items.items() for item in bill_items)
+
+
+def test_merchant_filter_matches_wildcards_literally(app):
+    for name in ('100% Organic', '1000 Organics', 'A_B Market', 'AXB Market', 'C\\D Deli'):
+        db.session.add(Bill(merchant_name=name, total_amount=Decimal('5.00'), user_id=1, date=datetime(2024, 1, 1)))
+    db.session.commit()
+
+    def merchants(merchant):
+        page, _ = Bill.get_user_bills_page(1, limit=10, merchant=merchant)
+        return sorted(bill['merchant_name'] for bill in page)
+
+    assert merchants('100%') == ['100% Organic']
+    assert merchants('a_b') == ['A_B Market']
+    assert merchants('c\\d') == ['C\\D Deli']
+    assert merchants('market') == ['AXB Market', 'A_B Market']
@@ -0,0 +1,62 @@
+import json
+import os
+from utils.expense_analysis import map_expense_response, merge_with_llm, expense_lines
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load(name):
+    with open(os.path.join(FIXTURES, name)) as fixture:
+        return json.load(fixture)
+
+
+def test_confident_response_maps_every_field():
+    data, missing = map_expense_response(load('analyze_expense_grocery.json'), 80.0)
+    assert missing == []
+    assert data['merchant_name'] == "TRADER JOE'S"
+    assert data['total_amount'] == 17.45
+    assert data['date'] == '2024-01-15'
+    assert data['items'] == [
+        {'name': 'ORGANIC BANANAS', 'quantity': 6, 'price': 0.23},
+        {'name': 'GREEK YOGURT', 'quantity': 2, 'price': 2.99},
+        {'name': 'SOURDOUGH BREAD', 'quantity': 1, 'price': 3.99},
+        {'name': 'GALA APPLES', 'quantity': 1, 'price': 4.10},
+        {'name': 'SPARKLING WATER', 'quantity': 1, 'price': 1.99},
+    ]
+
+
+def test_quantities_are_whole_numbers():
+    data, _ = map_expense_response(load('analyze_expense_grocery.json'), 80.0)
+    assert all(isinstance(item['quantity'], int) for item in data['items'])
+
+
+def test_low_confidence_fields_are_missing():
+    data, missing = map_expense_response(load('analyze_expense_low_confidence.json'), 80.0)
+    assert data == {'total_amount': 12.5}
+    assert missing == ['merchant_name', 'date', 'items']
+
+
+def test_threshold_is_applied():
+    data, missing = map_expense_response(load('analyze_expense_low_confidence.json'), 40.0)
+    assert data['merchant_name'] == 'CAFE R0SSO'
+    assert missing == ['date']
+
+
+def test_expense_lines_keep_reading_order():
+    lines = expense_lines(load('analyze_expense_low_confidence.json'))
+    assert lines == ['CAFE R0SSO', 'CAPPUCCINO 4.50', 'ALM0ND CR0ISSANT 8.00', 'Total 12.50']
+
+
+def test_llm_fills_only_missing_fields():
+    data, _ = map_expense_response(load('analyze_expense_low_confidence.json'), 80.0)
+    llm = {'merchant_name': 'Cafe Rosso', 'total_amount': 12.0, 'date': '2024-02-03',
+           'items': [{'name': 'Cappuccino', 'quantity': 1, 'price': 4.5}]}
+    merged = merge_with_llm(data, llm)
+    assert merged['total_amount'] == 12.5
+    assert merged['merchant_name'] == 'Cafe Rosso'
+    assert merged['date'] == '2024-02-03'
+    assert merged['items'] == llm['items']
+
+
+def test_llm_error_is_passed_through():
+    assert merge_with_llm({'total_amount': 12.5}, {'error': 'timeout'}) == {'error': 'timeout'}
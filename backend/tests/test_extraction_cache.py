@@ -0,0 +1,68 @@
+import fakeredis
+import pytest
+from utils import data_extraction
+from utils.bounded_cache import BoundedRedisCache
+from utils.data_extraction import DataExtractor
+from utils.ocr_backends import OCRBackend
+
+RECEIPT_LINES = ['STARBUCKS', 'Grande Latte 5.25', 'Total $5.25', '02/01/2024']
+
+
+class FakeBackend(OCRBackend):
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+
+    def _detect(self, file_bytes):
+        return {'Blocks': [{'BlockType': 'LINE', 'Text': line} for line in RECEIPT_LINES]}
+
+
+class FakeAIServices:
+    def __init__(self):
+        self.calls = 0
+
+    def openai_function_call(self, text, function_name):
+        self.calls += 1
+        return {'merchant_name': 'Starbucks', 'total_amount': 5.25, 'date': '2024-02-01', 'items': []}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = BoundedRedisCache('extraction_cache', ttl=60, max_entries=100, redis_client=fakeredis.FakeRedis())
+    monkeypatch.setattr(data_extraction, 'extraction_cache', cache)
+    monkeypatch.setattr(data_extraction, 'EXTRACTION_CACHE_ENABLED', True)
+    monkeypatch.setattr(data_extraction, 'EXTRACTION_MODE', 'text')
+    monkeypatch.setattr(data_extraction, 'FAST_PATH_ENABLED', False)
+    monkeypatch.setattr(data_extraction, 'PROMPT_COMPACTION_ENABLED', False)
+    monkeypatch.setattr(data_extraction.image_preprocessor, 'process', lambda file_bytes: (file_bytes, None))
+    return cache
+
+
+def extractor(backend_name):
+    extractor = DataExtractor.__new__(DataExtractor)
+    extractor.ocr_backend = FakeBackend(backend_name)
+    extractor.ai_services = FakeAIServices()
+    return extractor
+
+
+def test_same_bytes_through_two_backends_miss_independently(cache):
+    textract, tesseract = extractor('textract'), extractor('tesseract')
+    first = textract.extract_text_from_bytes(b'receipt image')
+    second = tesseract.extract_text_from_bytes(b'receipt image')
+    assert not first['cache_hit'] and not second['cache_hit']
+    assert textract.ocr_backend.stats()['documents'] == 1
+    assert tesseract.ocr_backend.stats()['documents'] == 1
+    assert first['content_hash'] == second['content_hash']
+
+    assert textract.extract_text_from_bytes(b'receipt image')['cache_hit']
+    assert tesseract.extract_text_from_bytes(b'receipt image')['cache_hit']
+    assert textract.ai_services.calls == 1 and tesseract.ai_services.calls == 1
+
+
+def test_extraction_mode_is_part_of_the_key(cache, monkeypatch):
+    # Expense mode only changes the Textract path; a local backend keeps the text path either way
+    tesseract = extractor('tesseract')
+    tesseract.extract_text_from_bytes(b'receipt image')
+    monkeypatch.setattr(data_extraction, 'EXTRACTION_MODE', 'expense')
+    assert not tesseract.extract_text_from_bytes(b'receipt image')['cache_hit']
+    assert tesseract.ocr_backend.stats()['documents'] == 2
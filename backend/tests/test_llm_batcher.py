@@ -0,0 +1,68 @@
+import threading
+import time
+from concurrent.futures import Future
+from utils.llm_batcher import LLMBatcher
+
+
+class FakeAIServices:
+    def __init__(self, batch_results, delay=0.2):
+        self.batch_results = batch_results
+        self.delay = delay
+        self.calls = []
+
+    def openai_batch_function_call(self, texts):
+        if isinstance(self.batch_results, Exception):
+            raise self.batch_results
+        return self.batch_results
+
+    def _invoke_function(self, text, function_name):
+        self.calls.append(text)
+        time.sleep(self.delay)
+        if text == 'broken':
+            raise RuntimeError('still broken')
+        return {'merchant_name': text}
+
+
+def dispatch(batcher, texts):
+    batcher._start()
+    batch = [(text, Future()) for text in texts]
+    started = time.monotonic()
+    batcher._dispatch(batch)
+    return [future for _, future in batch], time.monotonic() - started
+
+
+def test_successful_documents_resolve_before_fallbacks():
+    ai = FakeAIServices([{'merchant_name': 'a'}, {'error': 'invalid'}, {'merchant_name': 'c'}])
+    futures, elapsed = dispatch(LLMBatcher(ai, 10, 8), ['a', 'b', 'c'])
+    assert elapsed < ai.delay
+    assert futures[0].done() and futures[2].done()
+    assert futures[0].result() == {'merchant_name': 'a'}
+    assert futures[1].result(timeout=2) == {'merchant_name': 'b'}
+    assert ai.calls == ['b']
+
+
+def test_fallbacks_run_concurrently():
+    texts = ['a', 'b', 'c', 'd', 'broken']
+    ai = FakeAIServices(RuntimeError('batch failed'))
+    batcher = LLMBatcher(ai, 10, 8)
+    started = time.monotonic()
+    futures, _ = dispatch(batcher, texts)
+    results = [future.result(timeout=2) for future in futures]
+    assert time.monotonic() - started < ai.delay * 2
+    assert results[:4] == [{'merchant_name': text} for text in texts[:4]]
+    assert results[4] == {'error': 'still broken'}
+    assert batcher.stats()['single_fallbacks'] == 5
+
+
+def test_submit_batches_concurrent_requests():
+    ai = FakeAIServices([{'merchant_name': 'x'}, {'merchant_name': 'y'}])
+    batcher = LLMBatcher(ai, 200, 2)
+    results = {}
+    threads = [threading.Thread(target=lambda t=t: results.setdefault(t, batcher.submit(t))) for t in ('x', 'y')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=2)
+    assert sorted(r['merchant_name'] for r in results.values()) == ['x', 'y']
+    assert batcher.stats()['batches'] == 1
+    assert ai.calls == []
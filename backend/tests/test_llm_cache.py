@@ -0,0 +1,39 @@
+from utils.llm_cache import llm_cache_key, normalize_receipt_text
+
+RECEIPT = """WHOLE FOODS MARKET
+Receipt {date}
+Trans ID: 8812-33  Auth code 0A12B
+************1234
+{time}
+ORGANIC MILK 4.99
+BREAD 3.49
+TOTAL 8.48
+"""
+
+
+def key(**fields):
+    values = {'date': '2024-01-15', 'time': '14:32'}
+    values.update(fields)
+    return llm_cache_key(RECEIPT.format(**values), 'extract_financial_data', 'gpt-4o')
+
+
+def test_reprint_with_different_volatile_tokens_shares_key():
+    reprint = RECEIPT.format(date='2024-01-15', time='14:35').replace('8812-33', '9931-07').replace('1234', '9876')
+    assert llm_cache_key(reprint, 'extract_financial_data', 'gpt-4o') == key()
+
+
+def test_receipts_differing_only_in_date_have_different_keys():
+    assert key(date='2024-01-15') != key(date='2024-01-16')
+    assert key(date='01/15/2024') != key(date='01/16/2024')
+    assert key(date='20240115') != key(date='20240116')
+
+
+def test_dates_survive_normalization():
+    assert 'receipt 2024-01-15' in normalize_receipt_text("Receipt 2024-01-15 Store 42")
+    assert '20240115' in normalize_receipt_text("Ref #99812 20240115")
+
+
+def test_long_digit_runs_and_amounts():
+    normalized = normalize_receipt_text("Loyalty 123456789012\nTOTAL 1234.56")
+    assert '123456789012' not in normalized
+    assert 'total 1234.56' in normalized
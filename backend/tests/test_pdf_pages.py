@@ -0,0 +1,109 @@
+import io
+from concurrent.futures import Future
+import pytest
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+from utils import data_extraction, ocr_backends
+from utils.data_extraction import DataExtractor
+from utils.pdf_pages import split_pdf, scanned_page_image
+
+STATEMENT_LINES = [f"2024-01-{day:02d} GROCERY STORE PURCHASE {day}.50" for day in range(1, 11)]
+
+
+def text_page():
+    # A digitally generated page: text drawn with a standard font, no images
+    writer = PdfWriter()
+    page = writer.add_blank_page(width=612, height=792)
+    font = DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica')
+    })
+    page[NameObject('/Resources')] = DictionaryObject({
+        NameObject('/Font'): DictionaryObject({NameObject('/F1'): writer._add_object(font)})
+    })
+    commands = ['BT', '/F1 10 Tf', '14 TL', '40 750 Td']
+    commands += [f"({line}) Tj T*" for line in STATEMENT_LINES]
+    commands.append('ET')
+    content = DecodedStreamObject()
+    content.set_data('\n'.join(commands).encode())
+    page[NameObject('/Contents')] = writer._add_object(content)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def scanned_page(size):
+    # A scanner's output: one full-page image and no text layer
+    output = io.BytesIO()
+    Image.new('L', size, color=255).save(output, format='PDF', resolution=72)
+    return output.getvalue()
+
+
+def combine(*documents):
+    writer = PdfWriter()
+    for document in documents:
+        writer.append(PdfReader(io.BytesIO(document)))
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+class ImageOnlyExecutor:
+    """
+    Runs the Tesseract job inline, reporting the size of the image it was given
+    """
+
+    def submit(self, fn, file_bytes, lang):
+        with Image.open(io.BytesIO(file_bytes)) as image:
+            text = f"SCANNED PAGE {image.width}x{image.height}"
+        future = Future()
+        future.set_result({'Blocks': [{'BlockType': 'LINE', 'Text': text}]})
+        return future
+
+
+@pytest.fixture
+def tesseract_extractor(monkeypatch):
+    monkeypatch.setattr(ocr_backends, 'pytesseract', object())
+    backend = ocr_backends.TesseractBackend(workers=1)
+    monkeypatch.setattr(backend, '_get_executor', ImageOnlyExecutor)
+    monkeypatch.setattr(data_extraction, 'PDF_TEXT_LAYER_MIN_CHARS', 200)
+    extractor = DataExtractor.__new__(DataExtractor)
+    extractor.ocr_backend = backend
+    return extractor
+
+
+def test_split_keeps_page_order_and_text_layer():
+    pages = split_pdf(combine(scanned_page((300, 400)), text_page()), max_pages=5)
+    assert len(pages) == 2
+    assert pages[0][1].strip() == ''
+    assert STATEMENT_LINES[0] in pages[1][1]
+
+
+def test_scanned_page_image_returns_the_scan():
+    image = scanned_page_image(scanned_page((300, 400)))
+    with Image.open(io.BytesIO(image)) as decoded:
+        assert decoded.size == (300, 400)
+    assert scanned_page_image(text_page()) is None
+
+
+def test_multi_page_pdf_uses_text_layer_and_local_ocr(tesseract_extractor):
+    document = combine(text_page(), scanned_page((300, 400)), scanned_page((320, 240)))
+    lines, stats = tesseract_extractor._ocr_document(document)
+    assert lines == STATEMENT_LINES + ['SCANNED PAGE 300x400', 'SCANNED PAGE 320x240']
+    assert stats['pages'] == 3
+    assert stats['text_layer_pages'] == 1
+    assert tesseract_extractor.ocr_backend.stats()['documents'] == 2
+
+
+def test_single_scanned_page_pdf_uses_local_ocr(tesseract_extractor):
+    lines, stats = tesseract_extractor._ocr_document(scanned_page((300, 400)))
+    assert lines == ['SCANNED PAGE 300x400']
+    assert stats['text_layer_pages'] == 0
+
+
+def test_page_without_text_or_scan_is_rejected(tesseract_extractor, monkeypatch):
+    monkeypatch.setattr(data_extraction, 'PDF_TEXT_LAYER_MIN_CHARS', 0)
+    with pytest.raises(ValueError, match='textract'):
+        tesseract_extractor._ocr_document(text_page())
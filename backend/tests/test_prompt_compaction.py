@@ -0,0 +1,46 @@
+from utils.prompt_compaction import PromptCompactor
+
+RECEIPT = """AMAZON.COM
+Order 123
+01/15/2024
+Ship to: Jane Doe
+Seattle, WA
+POINTSETTIA PLANT 12.99
+PROPANE EXCHANGE 19.99
+KIRKLAND SIGNATURE WATER 4.99
+REWARDS DISCOUNT -2.00
+RETURN WIDGET -5.00
+TOTAL 30.97
+Return policy: returns accepted within 30 days
+Visit www.amazon.com/returns
+Thank you for shopping with us
+Cardholder signature
+Rewards number on file
+"""
+
+
+def compact(text, budget=1000):
+    compacted, _ = PromptCompactor(token_budget=budget).compact(text)
+    return compacted.splitlines()
+
+
+def test_item_lines_with_boilerplate_words_are_kept():
+    lines = compact(RECEIPT)
+    for item in ('POINTSETTIA PLANT 12.99', 'PROPANE EXCHANGE 19.99', 'KIRKLAND SIGNATURE WATER 4.99',
+                 'REWARDS DISCOUNT -2.00', 'RETURN WIDGET -5.00', 'TOTAL 30.97'):
+        assert item in lines
+
+
+def test_header_lines_are_always_kept():
+    assert compact(RECEIPT)[:3] == ['AMAZON.COM', 'Order 123', '01/15/2024']
+
+
+def test_boilerplate_without_amounts_is_dropped():
+    lines = compact(RECEIPT)
+    assert lines[-1] == 'TOTAL 30.97'
+    assert not any('policy' in line or 'www.' in line or 'Thank you' in line for line in lines)
+
+
+def test_budget_keeps_total_lines():
+    lines = compact(RECEIPT + '\n'.join(f"ITEM {i} {i}.99" for i in range(200)), budget=60)
+    assert 'TOTAL 30.97' in lines
@@ -0,0 +1,57 @@
+import json
+import os
+import pytest
+from utils import data_extraction
+from utils.data_extraction import DataExtractor
+from utils.receipt_parser import ReceiptParser, RECEIPT_TEMPLATES
+
+with open(os.path.join(os.path.dirname(__file__), 'fixtures', 'receipts.json')) as fixture:
+    RECEIPTS = json.load(fixture)
+
+
+def test_every_template_has_a_fixture():
+    merchants = {receipt['expected']['merchant_name'] for receipt in RECEIPTS['templates'].values()}
+    assert merchants == {template.merchant_name for template in RECEIPT_TEMPLATES}
+
+
+@pytest.mark.parametrize('name', sorted(RECEIPTS['templates']))
+def test_template_receipt_parses_and_reconciles(name):
+    receipt = RECEIPTS['templates'][name]
+    data, confidence, reconciled = ReceiptParser().parse(receipt['lines'])
+    assert reconciled
+    assert confidence == 1.0
+    assert data == receipt['expected']
+
+
+@pytest.mark.parametrize('name', sorted(RECEIPTS['fallback']))
+def test_low_confidence_receipt_is_not_accepted(name):
+    _, confidence, _ = ReceiptParser().parse(RECEIPTS['fallback'][name]['lines'])
+    assert confidence < 0.9
+
+
+@pytest.fixture
+def fast_path(monkeypatch):
+    monkeypatch.setattr(data_extraction, 'FAST_PATH_ENABLED', True)
+    monkeypatch.setattr(data_extraction, 'FAST_PATH_MIN_CONFIDENCE', 0.9)
+    monkeypatch.setattr(data_extraction, 'receipt_parser', ReceiptParser())
+    return data_extraction.receipt_parser
+
+
+def test_fast_path_accepts_template_receipt(fast_path):
+    receipt = RECEIPTS['templates']['trader_joes']
+    analysis, confidence = DataExtractor._fast_path_parse(receipt['lines'])
+    assert analysis == receipt['expected']
+    assert confidence == 1.0
+    assert fast_path.stats()['accepted'] == 1
+
+
+@pytest.mark.parametrize('name', sorted(RECEIPTS['fallback']))
+def test_fast_path_falls_through_to_llm(fast_path, name):
+    analysis, _ = DataExtractor._fast_path_parse(RECEIPTS['fallback'][name]['lines'])
+    assert analysis is None
+    assert fast_path.stats()['fallbacks'] == 1
+
+
+def test_fast_path_disabled(fast_path, monkeypatch):
+    monkeypatch.setattr(data_extraction, 'FAST_PATH_ENABLED', False)
+    assert DataExtractor._fast_path_parse(RECEIPTS['templates']['costco']['lines']) == (None, 0.0)
@@ -0,0 +1,62 @@
+import time
+import pytest
+from botocore.exceptions import ClientError
+from utils.resilience import ResilientCaller, ProviderUnavailableError, _aws_retriable
+
+
+def make_caller():
+    return ResilientCaller(
+        'test', timeout=2, max_attempts=1, base_delay=0, max_delay=0, budget_ratio=0,
+        failure_threshold=2, reset_timeout=0.05, is_retriable=_aws_retriable, workers=2
+    )
+
+
+def throttled():
+    raise ClientError({'Error': {'Code': 'ThrottlingException'}}, 'AnalyzeDocument')
+
+
+def unsupported_document():
+    raise ClientError({'Error': {'Code': 'UnsupportedDocumentException'}}, 'AnalyzeDocument')
+
+
+def open_breaker(caller):
+    for _ in range(2):
+        with pytest.raises(ClientError):
+            caller.call(throttled)
+    assert caller.breaker.state == 'open'
+    with pytest.raises(ProviderUnavailableError):
+        caller.call(lambda: 'ok')
+    time.sleep(0.1)
+
+
+def test_breaker_closes_after_successful_trial():
+    caller = make_caller()
+    open_breaker(caller)
+    assert caller.call(lambda: 'ok') == 'ok'
+    assert caller.breaker.state == 'closed'
+
+
+def test_breaker_reopens_after_failed_trial():
+    caller = make_caller()
+    open_breaker(caller)
+    with pytest.raises(ClientError):
+        caller.call(throttled)
+    assert caller.breaker.state == 'open'
+
+
+def test_non_retriable_error_during_trial_releases_it():
+    caller = make_caller()
+    open_breaker(caller)
+    with pytest.raises(ClientError):
+        caller.call(unsupported_document)
+    assert caller.breaker.state == 'half_open'
+    assert caller.call(lambda: 'ok') == 'ok'
+    assert caller.breaker.state == 'closed'
+
+
+def test_non_retriable_errors_do_not_open_breaker():
+    caller = make_caller()
+    for _ in range(5):
+        with pytest.raises(ClientError):
+            caller.call(unsupported_document)
+    assert caller.breaker.state == 'closed'
@@ -0,0 +1,98 @@
+import time
+import pytest
+from flask import Flask, jsonify
+from utils import cache_decorator
+from utils.cache_decorator import redis_cache, cache_generation_key, bump_user_cache_generation
+from utils.local_cache import LocalLRUCache
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+class User:
+    id = 7
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(cache_decorator, 'l1_cache', LocalLRUCache(max_entries=10, ttl=60, channel='test-invalidation'))
+    app = Flask(__name__)
+    app.redis_client = fakeredis.FakeRedis()
+    data = {'n': 1}
+
+    @redis_cache(lambda current_user: f"bills_{current_user.id}", timeout=60, etag=True)
+    def bills(current_user):
+        return jsonify(data), 200
+
+    @redis_cache(lambda current_user: f"missing_{current_user.id}", timeout=60, etag=True)
+    def missing(current_user):
+        return {'message': 'Bill not found'}, 404
+
+    app.add_url_rule('/bills', 'bills', lambda: bills(User()))
+    app.add_url_rule('/missing', 'missing', lambda: missing(User()))
+    client = app.test_client()
+    client.data = data
+    client.redis = app.redis_client
+    return client
+
+
+def test_matching_etag_gets_304(client):
+    etag = client.get('/bills').headers['ETag']
+    response = client.get('/bills', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+class NoRedis:
+    def __getattr__(self, name):
+        raise AssertionError(f"Redis called on an L1 hit: {name}")
+
+
+def test_l1_hit_makes_no_redis_call(client):
+    etag = client.get('/bills').headers['ETag']
+    client.application.redis_client = NoRedis()
+    response = client.get('/bills')
+    assert response.headers['ETag'] == etag
+    assert cache_decorator.l1_cache.stats()['hits'] == 1
+
+
+def test_bump_drops_local_l1_entries(client):
+    etag = client.get('/bills').headers['ETag']
+    client.data['n'] = 2
+    with client.application.app_context():
+        bump_user_cache_generation(User.id)
+    response = client.get('/bills', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json() == {'n': 2}
+    assert response.headers['ETag'] != etag
+
+
+def test_invalidation_message_drops_l1_entries(client):
+    client.get('/bills')
+    client.data['n'] = 2
+    # Another worker bumped the generation and published the user id
+    client.redis.incr(cache_generation_key(User.id))
+    cache_decorator.l1_cache.invalidate_user(User.id)
+    assert client.get('/bills').get_json() == {'n': 2}
+
+
+def test_missed_invalidation_message_is_bounded_by_l1_ttl(client):
+    cache_decorator.l1_cache.ttl = 0.05
+    client.get('/bills')
+    client.data['n'] = 2
+    client.redis.incr(cache_generation_key(User.id))
+    assert client.get('/bills').get_json() == {'n': 1}  # served from L1 until it expires
+    time.sleep(0.1)
+    assert client.get('/bills').get_json() == {'n': 2}
+
+
+def test_unchanged_body_after_bump_stays_not_modified(client):
+    etag = client.get('/bills').headers['ETag']
+    client.redis.incr(cache_generation_key(User.id))
+    assert client.get('/bills', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_errors_get_no_etag(client):
+    response = client.get('/missing')
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
@@ -0,0 +1,90 @@
+from datetime import datetime
+import pytest
+from models import db
+from models.bill import Bill
+from models.rollup import check_rollups, rebuild_rollups, spend_from_rollups, SpendDaily
+from models.user import User
+
+RECEIPTS = [
+    ('Costco', 120.50, '2024-01-03'),
+    ('Costco', 80.25, '2024-01-29'),
+    ('Target', 15.03, '2024-01-31'),
+    ('Target', 42.00, '2024-02-01'),
+    ('Starbucks', 5.25, '2024-02-12'),
+    ('Costco', 64.10, '2024-03-15'),
+    ('Starbucks', 9.40, '2025-01-02'),
+]
+
+
+@pytest.fixture
+def user(app):
+    user = User('rollups', 'rollups@example.com', 'secret')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def save(user_id, merchant, total, date):
+    return User.save_extracted_data(db, user_id, {
+        'merchant_name': merchant,
+        'total_amount': total,
+        'date': date,
+        'items': [{'name': f"{merchant} item", 'quantity': 1, 'price': total}]
+    }).id
+
+
+def spend(user_id, granularity, by_merchant=False, **dates):
+    return (spend_from_rollups(user_id, granularity, by_merchant=by_merchant, **dates),
+            Bill.spend_by_period(user_id, granularity, by_merchant=by_merchant, **dates))
+
+
+def test_rollups_follow_saves_and_deletes(user):
+    bill_ids = [save(user, *receipt) for receipt in RECEIPTS]
+    assert check_rollups() == []
+
+    Bill.delete_bill(db, bill_ids[1])
+    Bill.delete_bill(db, bill_ids[-1])
+    assert check_rollups() == []
+    # The 2025 day had only the deleted bill, so its row is gone
+    assert db.session.query(SpendDaily).filter(SpendDaily.day >= datetime(2025, 1, 1).date()).count() == 0
+
+
+@pytest.mark.parametrize('granularity', ['week', 'month', 'year'])
+def test_rollups_match_bills(user, granularity):
+    bill_ids = [save(user, *receipt) for receipt in RECEIPTS]
+    Bill.delete_bill(db, bill_ids[2])
+    from_rollups, from_bills = spend(user, granularity)
+    assert from_rollups == from_bills
+    assert sum(row['count'] for row in from_rollups) == len(RECEIPTS) - 1
+
+
+@pytest.mark.parametrize('granularity', ['month', 'year'])
+def test_rollups_match_bills_by_merchant(user, granularity):
+    for receipt in RECEIPTS:
+        save(user, *receipt)
+    from_rollups, from_bills = spend(user, granularity, by_merchant=True)
+    assert from_rollups == from_bills
+    assert {row['merchant_name'] for row in from_rollups} == {'Costco', 'Target', 'Starbucks'}
+
+
+def test_rollups_match_bills_for_day_bounded_range(user):
+    for receipt in RECEIPTS:
+        save(user, *receipt)
+    dates = {'date_from': datetime(2024, 1, 15), 'date_to': datetime(2024, 2, 10)}
+    from_rollups, from_bills = spend(user, 'month', **dates)
+    assert from_rollups == from_bills
+    # A merchant breakdown at day precision is left to the bills table
+    assert spend_from_rollups(user, 'month', by_merchant=True, **dates) is None
+
+
+def test_bills_saved_before_the_rollups_need_a_rebuild(user):
+    for receipt in RECEIPTS:
+        save(user, *receipt)
+    # An existing deployment: bills, but empty rollup tables
+    db.session.query(SpendDaily).delete()
+    db.session.commit()
+    assert check_rollups()
+
+    assert rebuild_rollups() == len(RECEIPTS)
+    assert check_rollups() == []
+    assert spend(user, 'week')[0] == spend(user, 'week')[1]
@@ -0,0 +1,96 @@
+import pytest
+from sqlalchemy import text
+from models import db, search
+from models.bill import Bill
+from models.search import search_bill_ids, add_to_search_index, remove_from_search_index, ensure_search_index
+from models.user import User
+
+
+@pytest.fixture
+def index(app, monkeypatch):
+    monkeypatch.setattr(search, '_index_available', False)
+    ensure_search_index()
+    return app
+
+
+def save(user_id, merchant, items, date='2024-01-15'):
+    return User.save_extracted_data(db, user_id, {
+        'merchant_name': merchant,
+        'total_amount': 10.0,
+        'date': date,
+        'items': [{'name': name, 'quantity': 1, 'price': 5.0} for name in items]
+    }).id
+
+
+def ids(user_id, query, limit=10):
+    return [bill_id for bill_id, _ in search_bill_ids(user_id, query, limit)]
+
+
+def test_saved_bills_are_indexed_per_user(index):
+    mine = save(1, 'Blue Bottle Coffee', ['Latte'])
+    theirs = save(2, 'Blue Bottle Coffee', ['Latte'])
+    assert ids(1, 'coffee') == [mine]
+    assert ids(2, 'coffee') == [theirs]
+    # Another user's id is not a search term
+    assert ids(1, '2') == []
+    assert ids(3, 'coffee') == []
+
+
+def test_prefix_terms_must_all_match(index):
+    bill_id = save(1, 'Trader Joes', ['Greek Yogurt', 'Bananas'])
+    save(1, 'Costco', ['Greek Salad'])
+    assert ids(1, 'yog') == [bill_id]
+    assert ids(1, 'greek banana') == [bill_id]
+    assert ids(1, 'greek pizza') == []
+
+
+def test_merchant_matches_rank_above_item_matches(index):
+    item_match = save(1, 'Corner Store', ['Coffee Beans'], date='2024-02-01')
+    merchant_match = save(1, 'Coffee Corner', ['Muffin'], date='2024-01-01')
+    results = search_bill_ids(1, 'coffee', 10)
+    assert [bill_id for bill_id, _ in results] == [merchant_match, item_match]
+    assert results[0][1] > results[1][1]
+
+
+def test_add_and_remove_from_search_index(index):
+    bill_id = save(1, 'Safeway', ['Apples'])
+    add_to_search_index(bill_id, 1, 'Safeway', ['Apples', 'Cereal'])
+    db.session.commit()
+    assert ids(1, 'cereal') == [bill_id]
+    assert db.session.execute(text("SELECT count(*) FROM bill_search")).scalar() == 1
+
+    remove_from_search_index(bill_id)
+    db.session.commit()
+    assert ids(1, 'safeway') == []
+
+
+def test_deleted_bills_leave_the_index(index):
+    bill_id = save(1, 'Walgreens', ['Shampoo'])
+    Bill.delete_bill(db, bill_id)
+    assert ids(1, 'shampoo') == []
+
+
+def test_unindexed_user_id_table_is_migrated(index, monkeypatch):
+    db.session.execute(text("DROP TABLE bill_search"))
+    db.session.execute(text(
+        "CREATE VIRTUAL TABLE bill_search USING fts5(merchant_name, items, user_id UNINDEXED, "
+        "tokenize = 'porter unicode61')"
+    ))
+    db.session.commit()
+    monkeypatch.setattr(search, '_index_available', False)
+    bill_id = save(1, 'Kroger', ['Eggs'])
+
+    ensure_search_index()
+    ddl = db.session.execute(text("SELECT sql FROM sqlite_master WHERE name = 'bill_search'")).scalar()
+    assert 'UNINDEXED' not in ddl
+    assert ids(1, 'eggs') == [bill_id]
+
+
+def test_like_fallback_without_index(app, monkeypatch):
+    monkeypatch.setattr(search, '_index_available', False)
+    older = save(1, 'Whole Foods Market', ['Organic Milk'], date='2024-01-01')
+    newer = save(1, 'Corner Market', ['Milk'], date='2024-02-01')
+    save(2, 'Corner Market', ['Milk'])
+    assert ids(1, 'milk') == [newer, older]
+    assert ids(1, 'market organic') == [older]
+    assert ids(1, 'bread') == []
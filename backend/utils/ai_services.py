@@ -6,7 +6,10 @@ from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 import json
-from config import OPENAI_API_KEY
+from config import OPENAI_API_KEY, OPENAI_TIMEOUT, LLM_CACHE_ENABLED, LLM_BATCHING_ENABLED, LLM_BATCH_WINDOW_MS, LLM_BATCH_MAX_SIZE
+from utils.llm_cache import llm_cache, llm_cache_key
+from utils.llm_batcher import LLMBatcher
+from utils.resilience import openai_guard
 
 load_dotenv()
 
@@ -16,17 +19,43 @@ class FinancialData(BaseModel):
     date: str = Field(description="Date of the transaction in YYYY-MM-DD format")
     items: List[Dict[str, Any]] = Field(description="List of items purchased")
 
+BATCH_INSTRUCTIONS = (
+    "The user message contains several independent documents, each under a '### Document N' heading.\n"
+    "Extract each document separately and return one entry per document in `documents`, "
+    "with `index` set to N. Never mix items or totals between documents."
+)
+
 class AIServices:
     def __init__(self):
         # Initialize OpenAI client
+        # Retries and deadlines are owned by openai_guard (utils/resilience.py)
         self.openai_client = ChatOpenAI(
             api_key=OPENAI_API_KEY,
-            model="gpt-4o-mini"
+            model="gpt-4o-mini",
+            request_timeout=OPENAI_TIMEOUT,
+            max_retries=0
         )
         
         # Initialize output parser
         self.parser = PydanticOutputParser(pydantic_object=FinancialData)
         
+        # The system prompt is identical for every call; build it once
+        self.system_prompt = (
+            "You are a financial document analyzer. Your job is to extract structured financial information from user-submitted receipts or transaction text.\n\n"
+            "Use the provided function tool to return the data in the following format:\n"
+            "- merchant_name: Name of the store or merchant (e.g., Walmart, Starbucks)\n"
+            "- total_amount: The total amount of the transaction as a number\n"
+            "- date: The date of the transaction in YYYY-MM-DD format\n"
+            "- items: A list of purchased items, each with:\n"
+            "    - name: Name or description of the item (e.g., 'Basmati Rice', 'Latte')\n"
+            "    - quantity: Number of units purchased\n"
+            "    - price: Price per unit (not total price for quantity)\n\n"
+            "Make sure match the total price of the items to the total amount of the transaction.\n"
+            "Double check the quantity and price of the items to make sure they are correct.\n"
+            "Ensure that you extract accurate values from the input. If something is missing or unclear, make a best guess based on typical receipts.\n\n"
+            f"{self.parser.get_format_instructions()}"
+        )
+
         # Define function schemas for structured responses
         self.function_schemas = {
             "extract_financial_data": {
@@ -73,6 +102,32 @@ class AIServices:
             }
         }
 
+        # Multi-document variant used by the micro-batcher
+        single = self.function_schemas["extract_financial_data"]["parameters"]
+        self.batch_function_schema = {
+            "name": "extract_financial_data_batch",
+            "description": "Extract financial information from each of several documents",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "documents": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": dict(single["properties"], index={
+                                "type": "integer",
+                                "description": "Number of the document, from its '### Document N' heading"
+                            }),
+                            "required": ["index"] + single["required"]
+                        }
+                    }
+                },
+                "required": ["documents"]
+            }
+        }
+
+        self.batcher = LLMBatcher(self, LLM_BATCH_WINDOW_MS, LLM_BATCH_MAX_SIZE) if LLM_BATCHING_ENABLED else None
+
     def openai_function_call(self, text, function_name):
         """
         Call OpenAI with function calling
@@ -83,46 +138,99 @@ class AIServices:
             if not function_schema:
                 return {"error": f"Function {function_name} not found"}
 
-            # Create messages with function calling and output format instructions
-            messages = [
-                {"role": "system", "content": "You are a financial document analyzer. Your job is to extract structured financial information from user-submitted receipts or transaction text.\n\n"
-    "Use the provided function tool to return the data in the following format:\n"
-    "- merchant_name: Name of the store or merchant (e.g., Walmart, Starbucks)\n"
-    "- total_amount: The total amount of the transaction as a number\n"
-    "- date: The date of the transaction in YYYY-MM-DD format\n"
-    "- items: A list of purchased items, each with:\n"
-    "    - name: Name or description of the item (e.g., 'Basmati Rice', 'Latte')\n"
-    "    - quantity: Number of units purchased\n"
-    "    - price: Price per unit (not total price for quantity)\n\n"
-    "Make sure match the total price of the items to the total amount of the transaction.\n"
-    "Double check the quantity and price of the items to make sure they are correct.\n"
-    "Ensure that you extract accurate values from the input. If something is missing or unclear, make a best guess based on typical receipts.\n\n"
-    f"{self.parser.get_format_instructions()}"},
-                {"role": "user", "content": text}
-            ]
-
-            # Call OpenAI with function calling
-            response = self.openai_client.invoke(
-                messages,
-                functions=[function_schema],
-                function_call={"name": function_name}
-            )
-            
-            # Parse the response using the output parser
-            try:
-                # Extract the function call arguments from the response
-                if hasattr(response, 'additional_kwargs') and 'function_call' in response.additional_kwargs:
-                    function_args = response.additional_kwargs['function_call']['arguments']
-                    # Parse the JSON string into a dictionary
-                    parsed_args = json.loads(function_args)
-                    # Create a FinancialData instance from the parsed arguments
-                    financial_data = FinancialData(**parsed_args)
-                    return financial_data.dict()
-                else:
-                    return {"error": "No function call found in response"}
-            except Exception as e:
-                return {"error": f"Failed to parse response: {str(e)}"}
+            # Same receipt text (after normalization) as an earlier call: reuse its result
+            cache_key = llm_cache_key(text, function_name, self.openai_client.model_name)
+            if LLM_CACHE_ENABLED:
+                cached = llm_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            if self.batcher is not None and function_name == 'extract_financial_data':
+                # Coalesced with concurrent uploads into one multi-document call
+                financial_data = self.batcher.submit(text)
+            else:
+                financial_data = self._invoke_function(text, function_name)
+
+            if LLM_CACHE_ENABLED and 'error' not in financial_data:
+                llm_cache.set(cache_key, financial_data)
+            return financial_data
 
         except Exception as e:
             print(f"OpenAI function call error: {str(e)}")
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
+
+    def _invoke_function(self, text, function_name):
+        """
+        Single-document OpenAI call; returns a FinancialData dict or {"error": ...}
+        """
+        function_schema = self.function_schemas[function_name]
+
+        # Create messages with function calling and output format instructions
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": text}
+        ]
+
+        # Call OpenAI with function calling
+        response = openai_guard.call(
+            self.openai_client.invoke,
+            messages,
+            functions=[function_schema],
+            function_call={"name": function_name}
+        )
+        
+        # Parse the response using the output parser
+        try:
+            parsed_args = self._function_arguments(response)
+            if parsed_args is None:
+                return {"error": "No function call found in response"}
+            # Create a FinancialData instance from the parsed arguments
+            return FinancialData(**parsed_args).dict()
+        except Exception as e:
+            return {"error": f"Failed to parse response: {str(e)}"}
+
+    def openai_batch_function_call(self, texts):
+        """
+        Extract several receipts with one OpenAI call.
+        Returns a list aligned with `texts`; each entry is a FinancialData dict (validated
+        individually) or {"error": ...} for documents missing from or invalid in the response.
+        """
+        documents = "\n\n".join(
+            f"### Document {index}\n{text}" for index, text in enumerate(texts)
+        )
+        messages = [
+            {"role": "system", "content": self.system_prompt + "\n\n" + BATCH_INSTRUCTIONS},
+            {"role": "user", "content": documents}
+        ]
+        response = openai_guard.call(
+            self.openai_client.invoke,
+            messages,
+            functions=[self.batch_function_schema],
+            function_call={"name": self.batch_function_schema["name"]}
+        )
+
+        results = [{"error": "Document missing from batch response"} for _ in texts]
+        try:
+            parsed_args = self._function_arguments(response)
+        except Exception as e:
+            return [{"error": f"Failed to parse response: {str(e)}"} for _ in texts]
+        if parsed_args is None:
+            return [{"error": "No function call found in response"} for _ in texts]
+        for document in parsed_args.get("documents", []):
+            index = document.pop("index", None)
+            if not isinstance(index, int) or not 0 <= index < len(texts):
+                continue
+            try:
+                results[index] = FinancialData(**document).dict()
+            except Exception as e:
+                results[index] = {"error": f"Failed to parse response: {str(e)}"}
+        return results
+
+    @staticmethod
+    def _function_arguments(response):
+        # Extract the function call arguments from the response
+        if hasattr(response, 'additional_kwargs') and 'function_call' in response.additional_kwargs:
+            function_args = response.additional_kwargs['function_call']['arguments']
+            # Parse the JSON string into a dictionary
+            return json.loads(function_args)
+        return None
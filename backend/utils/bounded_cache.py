@@ -0,0 +1,100 @@
+import json
+import threading
+import time
+import redis
+from config import REDIS_URL
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class BoundedRedisCache:
+    """
+    JSON values in Redis under a namespace, with a TTL per entry and a cap on the
+    number of entries. A sorted set indexes keys by last use so the least recently
+    used entries are evicted once the cap is exceeded. Hit/miss counters live in
+    Redis so they are aggregated across worker processes.
+
+    Redis errors never propagate: a failed read is a miss and a failed write is dropped.
+    """
+
+    def __init__(self, namespace, ttl, max_entries, redis_client=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._redis = redis_client
+        self._lock = threading.Lock()
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            with self._lock:
+                if self._redis is None:
+                    self._redis = redis.Redis.from_url(REDIS_URL)
+        return self._redis
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    @property
+    def _index_key(self):
+        return f"{self.namespace}:__index__"
+
+    @property
+    def _stats_key(self):
+        return f"{self.namespace}:__stats__"
+
+    def get(self, key):
+        try:
+            raw = self.redis.get(self._key(key))
+            pipe = self.redis.pipeline(transaction=False)
+            if raw is None:
+                pipe.hincrby(self._stats_key, 'misses', 1)
+            else:
+                pipe.hincrby(self._stats_key, 'hits', 1)
+                pipe.zadd(self._index_key, {key: time.time()})
+            pipe.execute()
+            return json.loads(raw) if raw is not None else None
+        except Exception as e:
+            logger.warning(f"Cache read failed for {self._key(key)}: {str(e)}")
+            return None
+
+    def set(self, key, value):
+        try:
+            now = time.time()
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.set(self._key(key), json.dumps(value), ex=self.ttl)
+            pipe.zadd(self._index_key, {key: now})
+            # Entries whose TTL has passed are already gone from Redis; drop them from the index
+            pipe.zremrangebyscore(self._index_key, '-inf', now - self.ttl)
+            pipe.zcard(self._index_key)
+            size = pipe.execute()[-1]
+            if size > self.max_entries:
+                self._evict(size - self.max_entries)
+        except Exception as e:
+            logger.warning(f"Cache write failed for {self._key(key)}: {str(e)}")
+
+    def _evict(self, count):
+        evicted = self.redis.zpopmin(self._index_key, count)
+        if not evicted:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(*[self._key(member.decode()) for member, _ in evicted])
+        pipe.hincrby(self._stats_key, 'evictions', len(evicted))
+        pipe.execute()
+
+    def stats(self):
+        raw = self.redis.hgetall(self._stats_key)
+        counters = {k.decode(): int(v) for k, v in raw.items()}
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'evictions': counters.get('evictions', 0),
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            'entries': self.redis.zcard(self._index_key),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl
+        }
@@ -1,32 +1,297 @@
 from functools import wraps
 import json
-from flask import jsonify, current_app
+import threading
+import time
+import uuid
+import hashlib
+from flask import current_app, request, make_response
 from utils.logger import get_logger
+from utils.local_cache import LocalLRUCache
+from utils.metrics import register_metrics
+from config import (
+    RESPONSE_L1_CACHE_ENABLED, RESPONSE_L1_CACHE_TTL, RESPONSE_L1_CACHE_MAX_ENTRIES, CACHE_INVALIDATION_CHANNEL,
+    CACHE_LOCK_TTL, CACHE_LOCK_WAIT, CACHE_LOCK_POLL_INTERVAL
+)
 
 logger = get_logger(__name__)
 
-def redis_cache(key_func, timeout=60):
+# Optional per-process L1 in front of Redis (L2); see utils/local_cache.py
+l1_cache = LocalLRUCache(
+    max_entries=RESPONSE_L1_CACHE_MAX_ENTRIES,
+    ttl=RESPONSE_L1_CACHE_TTL,
+    channel=CACHE_INVALIDATION_CHANNEL
+) if RESPONSE_L1_CACHE_ENABLED else None
+
+_stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0, 'stale_served': 0, 'revalidations': 0,
+          'lock_waiters': 0, 'waiters_served': 0, 'waiters_released': 0, 'wait_timeouts': 0, 'waiting': 0,
+          'not_modified': 0}
+_stats_lock = threading.Lock()
+
+# Deletes the lock only if this caller still owns it (it may have expired and been re-taken)
+RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _record(counter, value=1):
+    with _stats_lock:
+        _stats[counter] += value
+
+
+def cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    requests = stats['l1_hits'] + stats['l2_hits'] + stats['misses']
+    stats['l1_hit_ratio'] = round(stats['l1_hits'] / requests, 4) if requests else 0.0
+    stats['l2_hit_ratio'] = round(stats['l2_hits'] / requests, 4) if requests else 0.0
+    stats['l1'] = l1_cache.stats() if l1_cache else None
+    return stats
+
+
+register_metrics('response_cache', cache_stats)
+
+def cache_generation_key(user_id):
+    return f"cache_gen:{user_id}"
+
+
+def get_user_cache_generation(user_id):
+    """
+    Current cache generation of a user (0 until their data first changes)
+    """
+    generation = current_app.redis_client.get(cache_generation_key(user_id))
+    return int(generation) if generation is not None else 0
+
+
+def bump_user_cache_generation(user_id):
+    """
+    Invalidate every cached view of a user in O(1): cached keys embed the generation, so
+    after the bump no reader looks them up again and they age out through their TTL.
+    Call after any write to the user's bills, items or uploads.
+    """
+    generation = current_app.redis_client.incr(cache_generation_key(user_id))
+    if l1_cache:
+        # Local entries go at once; other workers drop theirs when the message arrives
+        l1_cache.invalidate_user(user_id)
+        current_app.redis_client.publish(CACHE_INVALIDATION_CHANNEL, user_id)
+    logger.info(f"Cache generation of user {user_id} bumped to {generation}")
+    return generation
+
+
+# Entry layout: version line, JSON header line [status, fresh_until, headers], then the
+# response body exactly as encoded on the miss
+ENTRY_VERSION = b'v2\n'
+# Recomputed or set per request, never replayed from the cache
+UNCACHED_HEADERS = {'content-length', 'set-cookie', 'cache-control'}
+
+
+def _entry(response):
+    headers = [(name, value) for name, value in response.headers.items() if name.lower() not in UNCACHED_HEADERS]
+    return response.get_data(), response.status_code, headers
+
+
+def _encode_entry(entry, fresh_until):
+    body, status, headers = entry
+    return ENTRY_VERSION + json.dumps([status, fresh_until, headers]).encode() + b'\n' + body
+
+
+def _build_response(entry):
+    body, status, headers = entry
+    return current_app.response_class(body, status=status, headers=headers)
+
+
+def _read(redis_client, redis_key):
+    """
+    Returns: ((body, status, headers), fresh) or None; entries in an older layout count as misses
+    """
+    return _parse(redis_client.get(redis_key))
+
+
+def _parse(cached_result):
+    if cached_result is None or not cached_result.startswith(ENTRY_VERSION):
+        return None
+    meta, body = cached_result[len(ENTRY_VERSION):].split(b'\n', 1)
+    status, fresh_until, headers = json.loads(meta)
+    return (body, status, [tuple(header) for header in headers]), time.time() < fresh_until
+
+
+def _acquire(redis_client, redis_key):
+    """
+    Short single-flight lock on a cache key; returns its token, or None if another caller holds it
+    """
+    token = uuid.uuid4().hex
+    if redis_client.set(f"lock:{redis_key}", token, nx=True, ex=CACHE_LOCK_TTL):
+        return token
+    return None
+
+
+def _release(redis_client, redis_key, token):
+    try:
+        redis_client.eval(RELEASE_LOCK, 1, f"lock:{redis_key}", token)
+    except Exception as e:
+        # The lock expires by itself after CACHE_LOCK_TTL
+        logger.warning(f"Failed to release cache lock for {redis_key}: {str(e)}")
+
+
+def _mark_uncacheable(redis_client, redis_key):
+    """
+    Tell the callers waiting on this key that the lock holder's result (an error, or any
+    non-200 response) will not be cached, so they stop polling
+    """
+    try:
+        redis_client.set(f"uncached:{redis_key}", 1, px=int(CACHE_LOCK_WAIT * 1000))
+    except Exception as e:
+        logger.warning(f"Failed to mark {redis_key} as uncacheable: {str(e)}")
+
+
+def _wait_for(redis_client, redis_key):
+    """
+    Poll for the value another caller is computing, for up to CACHE_LOCK_WAIT seconds.
+    Returns None at once if the lock holder marked its result as uncacheable.
+    """
+    _record('lock_waiters')
+    _record('waiting')
+    try:
+        deadline = time.monotonic() + CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(CACHE_LOCK_POLL_INTERVAL)
+            cached_result, uncacheable = redis_client.mget([redis_key, f"uncached:{redis_key}"])
+            cached = _parse(cached_result)
+            if cached is not None:
+                _record('waiters_served')
+                return cached
+            if uncacheable is not None:
+                _record('waiters_released')
+                return None
+        _record('wait_timeouts')
+        return None
+    finally:
+        _record('waiting', -1)
+
+
+def _body_etag(body):
+    # Derived from the bytes actually sent, so a 304 always stands for the body the client has
+    return hashlib.sha1(body).hexdigest()
+
+
+def _with_etag(response):
+    """
+    Attach the body's ETag to a successful response (browsers revalidate it on every load:
+    no-cache); answer 304 instead when the request's If-None-Match already holds it
+    """
+    if response.status_code != 200:
+        return response
+    etag_value = response.get_etag()[0] or _body_etag(response.get_data())
+    if request.if_none_match.contains(etag_value):
+        _record('not_modified')
+        logger.info(f"Not modified (304) for ETag: {etag_value}")
+        response = current_app.response_class(status=304)
+    response.set_etag(etag_value)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def redis_cache(key_func, timeout=60, stale_ttl=0, etag=False):
+    """
+    Cache a view's response in Redis under key_func(*args, **kwargs). The entry holds the
+    encoded body bytes with the status and headers, so a hit is served without decoding or
+    re-encoding any JSON.
+    For views that receive current_user (see token_required) the key is suffixed with
+    the user's cache generation, so bump_user_cache_generation() invalidates all of them.
+    With RESPONSE_L1_CACHE_ENABLED, those views are first looked up in the in-process
+    LRU, and a hit makes no Redis call at all. L1 holds the worker's own view of the
+    generation: a bump drops the user's L1 entries here at once and in other workers when
+    the pub/sub message arrives; a missed message is bounded by RESPONSE_L1_CACHE_TTL.
+
+    Recomputation is single-flight: on a miss, one caller takes a short Redis lock and runs
+    the view while concurrent callers wait for its result (computing it themselves if it
+    hasn't appeared after CACHE_LOCK_WAIT, or as soon as the holder's result turns out not
+    to be cacheable). With stale_ttl, an entry is kept that many seconds past `timeout`;
+    during that grace window one caller refreshes it and the others are served the previous
+    value. A generation bump is never bridged by a stale value.
+
+    With etag, successful responses carry a strong ETag hashed from their body when it is
+    cached, and a request whose If-None-Match matches gets a 304 without the body (or the
+    view running, on a hit).
+    """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
+            response = lookup(*args, **kwargs)
+            return _with_etag(response) if etag else response
+
+        def lookup(*args, **kwargs):
             redis_client = current_app.redis_client
             cache_key = key_func(*args, **kwargs)
-            cached_result = redis_client.get(cache_key)
-            if cached_result is not None:
-                logger.info(f"Cache HIT for key: {cache_key}")
-                data, status = json.loads(cached_result)
-                return jsonify(data), status
-            logger.info(f"Cache MISS for key: {cache_key}")
-            result = func(*args, **kwargs)
-            # Only cache successful responses (status 200)
-            if isinstance(result, tuple) and len(result) > 1 and result[1] == 200:
-                response, status = result
-                if hasattr(response, 'get_json'):
-                    data = response.get_json()
-                else:
-                    data = response
-                redis_client.set(cache_key, json.dumps([data, status]), ex=timeout)
-                logger.info(f"Cache SET for key: {cache_key} (timeout={timeout}s)")
-            return result
+            current_user = kwargs.get('current_user', args[0] if args else None)
+            user_id = current_user.id if hasattr(current_user, 'id') else None
+
+            # L1 is checked before the generation is read, so a hit costs no round-trip. The
+            # epoch is taken first: an invalidation that lands while the value is loaded from
+            # Redis makes set() refuse it
+            use_l1 = l1_cache is not None and user_id is not None
+            if use_l1:
+                l1_cache.start_listener(redis_client)
+                epoch = l1_cache.epoch(user_id)
+                cached = l1_cache.get(user_id, cache_key)
+                if cached is not None:
+                    _record('l1_hits')
+                    logger.info(f"Cache L1 HIT for key: {cache_key}")
+                    return _build_response(cached)
+
+            if user_id is not None:
+                redis_key = f"{cache_key}:g{get_user_cache_generation(user_id)}"
+            else:
+                redis_key = cache_key
+
+            token = None
+            cached = _read(redis_client, redis_key)
+            if cached is not None:
+                entry, fresh = cached
+                if not fresh:
+                    token = _acquire(redis_client, redis_key)
+                if token is None:
+                    if fresh:
+                        _record('l2_hits')
+                        logger.info(f"Cache HIT for key: {redis_key}")
+                        if use_l1:
+                            l1_cache.set(user_id, cache_key, entry, epoch)
+                    else:
+                        _record('stale_served')
+                        logger.info(f"Cache STALE for key: {redis_key} (refresh in progress)")
+                    return _build_response(entry)
+                _record('revalidations')
+                logger.info(f"Cache REVALIDATE for key: {redis_key}")
+            else:
+                _record('misses')
+                logger.info(f"Cache MISS for key: {redis_key}")
+                token = _acquire(redis_client, redis_key)
+                if token is None:
+                    cached = _wait_for(redis_client, redis_key)
+                    if cached is not None:
+                        return _build_response(cached[0])
+
+            stored = False
+            try:
+                response = make_response(func(*args, **kwargs))
+                # Only cache successful responses (status 200); the encoded body is stored as-is,
+                # so a hit replays the bytes without decoding or re-encoding JSON
+                if response.status_code == 200 and not response.is_streamed:
+                    if etag:
+                        response.set_etag(_body_etag(response.get_data()))
+                    entry = _entry(response)
+                    redis_client.set(redis_key, _encode_entry(entry, time.time() + timeout), ex=timeout + stale_ttl)
+                    if use_l1:
+                        l1_cache.set(user_id, cache_key, entry, epoch)
+                    stored = True
+                    logger.info(f"Cache SET for key: {redis_key} (timeout={timeout}s, stale_ttl={stale_ttl}s)")
+                return response
+            finally:
+                if token is not None:
+                    if not stored:
+                        _mark_uncacheable(redis_client, redis_key)
+                    _release(redis_client, redis_key, token)
         return wrapper
-    return decorator 
\ No newline at end of file
+    return decorator
@@ -0,0 +1,83 @@
+import os
+import threading
+import boto3
+from botocore.config import Config
+from config import (
+    AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION,
+    AWS_MAX_POOL_CONNECTIONS, AWS_MAX_ATTEMPTS, AWS_CONNECT_TIMEOUT, AWS_READ_TIMEOUT, TEXTRACT_TIMEOUT
+)
+
+# Process-wide registry of remote clients. Each client is built on first use and then
+# shared by every request and worker thread in the process, so TLS connections and
+# credential resolution are reused. boto3 clients and ChatOpenAI are thread-safe once
+# built; construction is serialized because boto3 sessions are not.
+#
+# Connection pools must not be shared across fork(): a forked gunicorn worker starts
+# with an empty registry and builds its own clients.
+
+BOTO_CONFIG = Config(
+    region_name=AWS_REGION,
+    max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+    tcp_keepalive=True,
+    connect_timeout=AWS_CONNECT_TIMEOUT,
+    read_timeout=AWS_READ_TIMEOUT,
+    retries={'mode': 'adaptive', 'max_attempts': AWS_MAX_ATTEMPTS}
+)
+# Textract calls run under a TEXTRACT_TIMEOUT deadline in utils/resilience.py, which also retries
+# them. A call abandoned at the deadline must end soon after it instead of holding a worker of
+# the caller's pool, so the socket timeout is no longer than the deadline and botocore does not
+# retry on its own.
+TEXTRACT_BOTO_CONFIG = BOTO_CONFIG.merge(Config(
+    read_timeout=min(AWS_READ_TIMEOUT, TEXTRACT_TIMEOUT),
+    retries={'mode': 'adaptive', 'max_attempts': 1}
+))
+
+_clients = {}
+_lock = threading.Lock()
+_pid = os.getpid()
+
+
+def _reset():
+    global _lock, _pid
+    _clients.clear()
+    _lock = threading.Lock()
+    _pid = os.getpid()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset)
+
+
+def _get(name, factory):
+    if os.getpid() != _pid:
+        _reset()
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = factory()
+                _clients[name] = client
+    return client
+
+
+def _boto3_session():
+    return boto3.session.Session(
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        region_name=AWS_REGION
+    )
+
+
+def get_textract_client():
+    return _get('textract', lambda: _boto3_session().client('textract', config=TEXTRACT_BOTO_CONFIG))
+
+
+def get_s3_client():
+    return _get('s3', lambda: _boto3_session().client('s3', config=BOTO_CONFIG))
+
+
+def get_ai_services():
+    # Imported here to keep this module free of the langchain import chain
+    from utils.ai_services import AIServices
+    return _get('ai_services', AIServices)
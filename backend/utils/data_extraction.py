@@ -1,56 +1,206 @@
-import boto3
 import os
 from botocore.exceptions import ClientError
-from config import AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION
-from utils.ai_services import AIServices
+from config import (
+    EXTRACTION_CACHE_ENABLED, EXTRACTION_CACHE_TTL, EXTRACTION_CACHE_MAX_ENTRIES,
+    S3_UPLOAD_WORKERS,
+    IMAGE_PREPROCESSING_ENABLED, IMAGE_TARGET_DPI, IMAGE_PAGE_INCHES, IMAGE_JPEG_QUALITY,
+    IMAGE_PREPROCESS_WORKERS,
+    FAST_PATH_ENABLED, FAST_PATH_MIN_CONFIDENCE,
+    PROMPT_COMPACTION_ENABLED, PROMPT_TOKEN_BUDGET,
+    EXTRACTION_MODE, EXPENSE_MIN_CONFIDENCE,
+    OCR_BACKEND, TESSERACT_WORKERS, TESSERACT_LANG,
+    PDF_MAX_PAGES, PDF_PAGE_WORKERS, PDF_TEXT_LAYER_MIN_CHARS, TEXTRACT_POLL_INTERVAL, TEXTRACT_JOB_TIMEOUT
+)
+from utils.clients import get_textract_client, get_s3_client, get_ai_services
+from utils.resilience import textract_guard
+from utils.bounded_cache import BoundedRedisCache
+from utils.image_preprocessing import ImagePreprocessor
+from utils.ocr_backends import TextractBackend, TesseractBackend
+from utils.pdf_pages import is_pdf, split_pdf, scanned_page_image, text_layer_lines
+from utils.receipt_parser import ReceiptParser
+from utils.prompt_compaction import PromptCompactor
+from utils.expense_analysis import map_expense_response, expense_lines, merge_with_llm
+from utils.ai_services import FinancialData
+from utils.metrics import register_metrics
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+import hashlib
+import threading
+import time
 import uuid
 import datetime
 
+# OCR lines and parsed FinancialData, keyed by OCR backend, extraction mode and SHA-256 of the uploaded bytes
+extraction_cache = BoundedRedisCache(
+    'extraction_cache',
+    ttl=EXTRACTION_CACHE_TTL,
+    max_entries=EXTRACTION_CACHE_MAX_ENTRIES
+)
+register_metrics('extraction_cache', extraction_cache.stats)
+
+# Image normalization before OCR, on a process pool
+image_preprocessor = ImagePreprocessor(
+    enabled=IMAGE_PREPROCESSING_ENABLED,
+    target_dpi=IMAGE_TARGET_DPI,
+    page_inches=IMAGE_PAGE_INCHES,
+    jpeg_quality=IMAGE_JPEG_QUALITY,
+    workers=IMAGE_PREPROCESS_WORKERS
+)
+register_metrics('image_preprocessing', image_preprocessor.stats)
+
+# OCR engines, selectable per deployment (OCR_BACKEND) or per request
+ocr_backends = {
+    'textract': TextractBackend(get_textract_client, textract_guard),
+    'tesseract': TesseractBackend(workers=TESSERACT_WORKERS, lang=TESSERACT_LANG)
+}
+for _name, _backend in ocr_backends.items():
+    register_metrics(f"ocr_{_name}", _backend.stats)
+
+
+def available_ocr_backends():
+    return [name for name, backend in ocr_backends.items() if backend.available]
+
+
+# Template parser tried before the LLM
+receipt_parser = ReceiptParser()
+register_metrics('receipt_parser', receipt_parser.stats)
+
+# Boilerplate stripping and token budget for the LLM input
+prompt_compactor = PromptCompactor(token_budget=PROMPT_TOKEN_BUDGET)
+register_metrics('prompt_compaction', prompt_compactor.stats)
+
+# Pool for S3 archive uploads that run alongside extraction
+_s3_executor = None
+_s3_executor_lock = threading.Lock()
+
+
+def _get_s3_executor():
+    global _s3_executor
+    if _s3_executor is None:
+        with _s3_executor_lock:
+            if _s3_executor is None:
+                _s3_executor = ThreadPoolExecutor(max_workers=S3_UPLOAD_WORKERS, thread_name_prefix='s3-upload')
+    return _s3_executor
+
+
+# Pool for the pages of a multi-page PDF
+_page_executor = None
+_page_executor_lock = threading.Lock()
+
+
+def _get_page_executor():
+    global _page_executor
+    if _page_executor is None:
+        with _page_executor_lock:
+            if _page_executor is None:
+                _page_executor = ThreadPoolExecutor(max_workers=PDF_PAGE_WORKERS, thread_name_prefix='pdf-page')
+    return _page_executor
+
 class DataExtractor:
-    def __init__(self):
-        self.textract = boto3.client(
-            'textract',
-            aws_access_key_id=AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-            region_name=AWS_REGION
-        )
-        self.ai_services = AIServices()
+    def __init__(self, ocr_backend=None):
+        # Shared, lazily built clients (see utils/clients.py); constructing a DataExtractor is cheap
+        self.textract = get_textract_client()
+        self.ai_services = get_ai_services()
+        name = (ocr_backend or OCR_BACKEND).lower()
+        if name not in ocr_backends:
+            raise ValueError(f"Unknown OCR backend: {name}")
+        self.ocr_backend = ocr_backends[name]
 
     def extract_text_from_file(self, file_path):
         """
-        Extract text from a file using AWS Textract and analyze with Perplexity
+        Extract text from a file using AWS Textract and analyze with OpenAI
         """
-        try:
-            # Check if file exists
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f"File not found: {file_path}")
+        # Check if file exists
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
 
-            # Read the file
-            with open(file_path, 'rb') as file:
-                file_bytes = file.read()
+        # Read the file
+        with open(file_path, 'rb') as file:
+            file_bytes = file.read()
 
-            # Call Textract
-            response = self.textract.detect_document_text(
-                Document={'Bytes': file_bytes}
-            )
+        return self.extract_text_from_bytes(file_bytes)
+
+    def extract_text_from_bytes(self, file_bytes):
+        """
+        Extract text from raw file bytes with the selected OCR backend (AWS Textract by default)
+        and analyze with OpenAI.
+        Results are cached by OCR backend, extraction mode and the SHA-256 of the bytes, so a
+        repeat upload of the same file skips OCR, and the LLM call too once an analysis has
+        succeeded; the same file read by another engine or mode is extracted afresh.
+        """
+        try:
+            content_hash = hashlib.sha256(file_bytes).hexdigest()
+            cache_key = f"{self.ocr_backend.name}:{EXTRACTION_MODE}:{content_hash}"
+            cached = extraction_cache.get(cache_key) if EXTRACTION_CACHE_ENABLED else None
+            if cached and cached.get('analysis'):
+                return {
+                    'extracted_text': '\n'.join(cached['lines']).strip(),
+                    'analysis': cached['analysis'],
+                    'content_hash': content_hash,
+                    'cache_hit': True
+                }
 
-            # Extract text from response
-            extracted_text = ""
-            for item in response.get('Blocks', []):
-                if item['BlockType'] == 'LINE':
-                    extracted_text += item['Text'] + '\n'
+            preprocessing, pdf_stats = None, None
+            expense_data, missing = None, None
+            if cached:
+                # Textract output is cached but the previous LLM call failed
+                lines = cached['lines']
+            else:
+                # Normalize phone photos before OCR (smaller payload, under Textract's byte limit)
+                ocr_bytes, preprocessing = image_preprocessor.process(file_bytes)
+                if EXTRACTION_MODE == 'expense' and self.ocr_backend.name == 'textract' and not is_pdf(ocr_bytes):
+                    # Structured expense analysis: vendor, total, date and line items come back as fields
+                    response = textract_guard.call(
+                        self.textract.analyze_expense,
+                        Document={'Bytes': ocr_bytes}
+                    )
+                    lines = expense_lines(response)
+                    expense_data, missing = map_expense_response(response, EXPENSE_MIN_CONFIDENCE)
+                else:
+                    # Textract or local OCR; both return Textract-shaped LINE blocks
+                    lines, pdf_stats = self._ocr_document(ocr_bytes)
 
-            extracted_text = extracted_text.strip()
+            extracted_text = '\n'.join(lines).strip()
 
-            # Analyze text with Perplexity using function calling
-            analysis = self.ai_services.openai_function_call(
-                text=extracted_text,
-                function_name='extract_financial_data'
-            )
+            analysis, confidence, parser = None, 0.0, 'expense'
+            if expense_data and not missing:
+                analysis = FinancialData(**expense_data).dict()
+            else:
+                # Receipts with a known layout are parsed locally; the LLM only sees the rest
+                analysis, confidence = self._fast_path_parse(lines)
+                parser = 'fast_path'
+            compaction = None
+            if analysis is None:
+                parser = 'expense+llm' if expense_data else 'llm'
+                llm_text = extracted_text
+                if PROMPT_COMPACTION_ENABLED:
+                    llm_text, compaction = prompt_compactor.compact(extracted_text)
+                # Analyze text with OpenAI using function calling
+                analysis = self.ai_services.openai_function_call(
+                    text=llm_text,
+                    function_name='extract_financial_data'
+                )
+                if expense_data:
+                    # Only the fields AnalyzeExpense missed (or was unsure of) come from the LLM
+                    analysis = merge_with_llm(expense_data, analysis)
+
+            if EXTRACTION_CACHE_ENABLED:
+                extraction_cache.set(cache_key, {
+                    'lines': lines,
+                    'analysis': None if 'error' in analysis else analysis
+                })
 
             return {
                 'extracted_text': extracted_text,
-                'analysis': analysis
+                'analysis': analysis,
+                'content_hash': content_hash,
+                'cache_hit': False,
+                'preprocessing': preprocessing,
+                'parser': parser,
+                'parser_confidence': confidence,
+                'prompt_compaction': compaction,
+                'missing_fields': missing,
+                'pdf': pdf_stats
             }
 
         except ClientError as e:
@@ -60,30 +210,90 @@ class DataExtractor:
             print(f"Error processing text: {str(e)}")
             raise Exception(f"Error processing text: {str(e)}")
 
+    @staticmethod
+    def _fast_path_parse(lines):
+        """
+        Run the template parser over the LINE text.
+        Returns: (dict, float) - (FinancialData dict if confident and reconciled else None, confidence)
+        """
+        if not FAST_PATH_ENABLED:
+            return None, 0.0
+        analysis, confidence, reconciled = receipt_parser.parse(lines)
+        accepted = analysis is not None and reconciled and confidence >= FAST_PATH_MIN_CONFIDENCE
+        receipt_parser.record(accepted)
+        return (analysis if accepted else None), confidence
+
+    def _ocr_document(self, ocr_bytes):
+        """
+        OCR an image, or every page of a PDF. PDF pages are OCRed concurrently on the page
+        pool (pages with a usable text layer skip OCR) and their lines are stitched back
+        together in page order, so the document still gets a single extraction call.
+        Backends that only read images (Tesseract) are given the scan embedded in each page.
+        Returns: (list, dict) - (LINE text, {'pages', 'text_layer_pages', 'seconds'} or None for images)
+        """
+        if not is_pdf(ocr_bytes):
+            return self._lines_from_blocks(self.ocr_backend.detect(ocr_bytes)), None
+
+        started = time.perf_counter()
+        pages = split_pdf(ocr_bytes, PDF_MAX_PAGES)
+
+        def page_lines(page):
+            page_bytes, text = page
+            lines = text_layer_lines(text, PDF_TEXT_LAYER_MIN_CHARS)
+            if lines is not None:
+                return lines, True
+            if not self.ocr_backend.accepts_pdf:
+                page_bytes = scanned_page_image(page_bytes)
+                if page_bytes is None:
+                    raise ValueError(
+                        f"The {self.ocr_backend.name} OCR backend cannot read this PDF page: it has no text layer "
+                        "and no scanned image; upload it with the textract backend"
+                    )
+            return self._lines_from_blocks(self.ocr_backend.detect(page_bytes)), False
+
+        if len(pages) == 1:
+            results = [page_lines(pages[0])]
+        else:
+            # map() yields in submission order, which keeps the pages in order
+            results = list(_get_page_executor().map(page_lines, pages))
+        lines = [line for page, _ in results for line in page]
+        return lines, {
+            'pages': len(pages),
+            'text_layer_pages': sum(1 for _, from_text_layer in results if from_text_layer),
+            'seconds': round(time.perf_counter() - started, 4)
+        }
+
+    @staticmethod
+    def _lines_from_blocks(response):
+        """
+        Text of the LINE blocks in a Textract response, in reading order
+        """
+        return [item['Text'] for item in response.get('Blocks', []) if item['BlockType'] == 'LINE']
+
     def extract_text_from_s3(self, bucket_name, object_key):
         """
-        Extract text from a file in S3 using AWS Textract and analyze with Perplexity
+        Extract text from a file in S3 using AWS Textract and analyze with OpenAI.
+        PDFs go through the asynchronous text detection job, which reads every page from S3;
+        images use the synchronous API.
         """
         try:
-            response = self.textract.detect_document_text(
-                Document={
-                    'S3Object': {
-                        'Bucket': bucket_name,
-                        'Name': object_key
-                    }
+            document = {
+                'S3Object': {
+                    'Bucket': bucket_name,
+                    'Name': object_key
                 }
-            )
-
-            # Extract text from response
-            extracted_text = ""
-            for item in response.get('Blocks', []):
-                if item['BlockType'] == 'LINE':
-                    extracted_text += item['Text'] + '\n'
+            }
+            head = get_s3_client().head_object(Bucket=bucket_name, Key=object_key)
+            if object_key.lower().endswith('.pdf') or head.get('ContentType') == 'application/pdf':
+                lines = self._detect_s3_pdf_lines(document)
+            else:
+                response = textract_guard.call(self.textract.detect_document_text, Document=document)
+                lines = self._lines_from_blocks(response)
 
-            extracted_text = extracted_text.strip()
+            extracted_text = '\n'.join(lines).strip()
 
-            # Analyze text with Perplexity using function calling
-            analysis = self.ai_services.perplexity_function_call(
+            # Analyze text with OpenAI using function calling
+            analysis = self.ai_services.openai_function_call(
                 text=extracted_text,
                 function_name='extract_financial_data'
             )
@@ -100,40 +310,129 @@ class DataExtractor:
             print(f"Error processing text: {str(e)}")
             raise Exception(f"Error processing text: {str(e)}")
 
+    def _detect_s3_pdf_lines(self, document):
+        """
+        Run an asynchronous Textract text detection job over a PDF in S3 and poll until it finishes.
+        Returns: list - LINE text of every page, in page order
+        """
+        job_id = textract_guard.call(
+            self.textract.start_document_text_detection,
+            DocumentLocation=document
+        )['JobId']
+        deadline = time.monotonic() + TEXTRACT_JOB_TIMEOUT
+        while True:
+            response = textract_guard.call(self.textract.get_document_text_detection, JobId=job_id)
+            status = response['JobStatus']
+            if status in ('SUCCEEDED', 'PARTIAL_SUCCESS'):
+                break
+            if status == 'FAILED':
+                raise Exception(f"Textract job {job_id} failed: {response.get('StatusMessage', 'unknown error')}")
+            if time.monotonic() > deadline:
+                raise Exception(f"Textract job {job_id} did not finish within {TEXTRACT_JOB_TIMEOUT}s")
+            time.sleep(TEXTRACT_POLL_INTERVAL)
+
+        # Results are paginated; blocks carry their page number
+        blocks = list(response.get('Blocks', []))
+        while response.get('NextToken'):
+            response = textract_guard.call(
+                self.textract.get_document_text_detection,
+                JobId=job_id,
+                NextToken=response['NextToken']
+            )
+            blocks.extend(response.get('Blocks', []))
+        line_blocks = [block for block in blocks if block['BlockType'] == 'LINE']
+        line_blocks.sort(key=lambda block: block.get('Page', 1))
+        return [block['Text'] for block in line_blocks]
+
     @staticmethod
-    def upload_image_to_s3(image_path, bucket_name, user_id, content_type="image/jpeg", folder="uploads"):
+    def upload_image_to_s3(image_path, bucket_name, user_id, content_type="image/jpeg", folder="uploads", tags=None):
         """
         Uploads an image file to an S3 bucket.
         Args:
-            image_path: Path to the image file
+            image_path: Path to the image file, or an in-memory file object (uploaded as-is)
             bucket_name: The S3 bucket name
             user_id: The user ID to include in the filename
             content_type: The MIME type of the image (default: 'image/jpeg')
             folder: The S3 folder path (default: 'uploads')
+            tags: Optional dict of S3 object tags
         Returns:
             The S3 key if upload is successful, else None.
         """
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         unique_filename = f"{user_id}_{timestamp}_{uuid.uuid4()}.jpg"
         s3_key = f"{folder}/{unique_filename}"
-        s3 = boto3.client('s3',
-            aws_access_key_id=AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-            region_name=AWS_REGION
-        )
+        s3 = get_s3_client()
         try:
-            with open(image_path, 'rb') as img_file:
+            extra_args = {'Tagging': urlencode(tags)} if tags else {}
+            if isinstance(image_path, str):
+                with open(image_path, 'rb') as img_file:
+                    s3.put_object(
+                        Bucket=bucket_name,
+                        Key=s3_key,
+                        Body=img_file,
+                        ContentType=content_type,
+                        **extra_args
+                    )
+            else:
+                image_path.seek(0)
                 s3.put_object(
                     Bucket=bucket_name,
                     Key=s3_key,
-                    Body=img_file,
-                    ContentType=content_type
+                    Body=image_path,
+                    ContentType=content_type,
+                    **extra_args
                 )
             return s3_key
         except (ClientError, Exception) as e:
             print(f"Error uploading to S3: {e}")
             return None
 
+    @staticmethod
+    def upload_image_to_s3_async(image_path, bucket_name, user_id, content_type="image/jpeg", folder="uploads", tags=None):
+        """
+        Start upload_image_to_s3 on the shared S3 upload pool so it overlaps with extraction.
+        Returns:
+            A Future resolving to the S3 key, or None if the upload failed.
+        """
+        return _get_s3_executor().submit(
+            DataExtractor.upload_image_to_s3,
+            image_path, bucket_name, user_id, content_type, folder, tags
+        )
+
+    @staticmethod
+    def tag_s3_object(bucket_name, object_key, tags):
+        """
+        Replace the tag set of an S3 object.
+        Returns:
+            True if tagging succeeded, else False.
+        """
+        s3 = get_s3_client()
+        try:
+            s3.put_object_tagging(
+                Bucket=bucket_name,
+                Key=object_key,
+                Tagging={'TagSet': [{'Key': k, 'Value': str(v)} for k, v in tags.items()]}
+            )
+            return True
+        except (ClientError, Exception) as e:
+            print(f"Error tagging S3 object: {e}")
+            return False
+
+    @staticmethod
+    def delete_s3_object(bucket_name, object_key):
+        """
+        Delete an S3 object.
+        Returns:
+            True if the delete succeeded, else False.
+        """
+        s3 = get_s3_client()
+        try:
+            s3.delete_object(Bucket=bucket_name, Key=object_key)
+            return True
+        except (ClientError, Exception) as e:
+            print(f"Error deleting S3 object: {e}")
+            return False
+
     @staticmethod
     def generate_presigned_url(bucket_name, object_key, expiration=300):
         """
@@ -147,12 +446,7 @@ class DataExtractor:
         """
         # Enforce guardrail: Max 10 minutes (600 seconds) for security
         expiration = min(expiration, 600)
-        s3 = boto3.client(
-            's3',
-            aws_access_key_id=AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-            region_name=AWS_REGION
-        )
+        s3 = get_s3_client()
         try:
             response = s3.generate_presigned_url('get_object',
                                                 Params={'Bucket': bucket_name,
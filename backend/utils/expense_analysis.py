@@ -0,0 +1,140 @@
+import json
+import re
+import sys
+from utils.receipt_parser import find_date, add_item
+
+# Textract AnalyzeExpense summary field types, in order of preference
+VENDOR_TYPES = ['VENDOR_NAME', 'NAME', 'RECEIVER_NAME']
+TOTAL_TYPES = ['TOTAL', 'AMOUNT_PAID', 'AMOUNT_DUE']
+DATE_TYPES = ['INVOICE_RECEIPT_DATE', 'ORDER_DATE', 'DELIVERY_DATE']
+
+REQUIRED_FIELDS = ['merchant_name', 'total_amount', 'date', 'items']
+
+
+def _field_type(field):
+    return field.get('Type', {}).get('Text')
+
+
+def _value(field):
+    detection = field.get('ValueDetection', {})
+    return detection.get('Text', '').strip(), min(
+        detection.get('Confidence', 0.0),
+        field.get('Type', {}).get('Confidence', 100.0)
+    )
+
+
+def _to_amount(text):
+    match = re.search(r'-?\d[\d,]*\.?\d*', text.replace(' ', ''))
+    if not match:
+        return None
+    try:
+        return float(match.group(0).replace(',', ''))
+    except ValueError:
+        return None
+
+
+def _to_quantity(text):
+    # Item.quantity is an integer; weighed quantities (1.52 lb) are not counts, so they are dropped
+    quantity = _to_amount(text)
+    if quantity is None or quantity <= 0 or quantity != int(quantity):
+        return None
+    return int(quantity)
+
+
+def _best_summary_field(summary_fields, types, min_confidence, convert):
+    for field_type in types:
+        for field in summary_fields:
+            if _field_type(field) != field_type:
+                continue
+            text, confidence = _value(field)
+            value = convert(text) if text else None
+            if value is not None and confidence >= min_confidence:
+                return value
+    return None
+
+
+def expense_lines(response):
+    """
+    LINE text of every expense document, in reading order (same shape as detect_document_text)
+    """
+    return [
+        block['Text']
+        for document in response.get('ExpenseDocuments', [])
+        for block in document.get('Blocks', [])
+        if block.get('BlockType') == 'LINE'
+    ]
+
+
+def map_expense_response(response, min_confidence):
+    """
+    Map a Textract AnalyzeExpense response onto the FinancialData fields.
+    Fields below `min_confidence` (Textract's 0-100 scale) are treated as missing.
+    Pure function of the response JSON, so it can be checked against recorded responses.
+    Returns: (dict, list) - (fields that were found, names of the FinancialData fields still missing)
+    """
+    data = {}
+    items = []
+    items_confident = True
+    for document in response.get('ExpenseDocuments', []):
+        summary = document.get('SummaryFields', [])
+        if 'merchant_name' not in data:
+            merchant = _best_summary_field(summary, VENDOR_TYPES, min_confidence, lambda t: t.splitlines()[0])
+            if merchant:
+                data['merchant_name'] = merchant
+        if 'total_amount' not in data:
+            total = _best_summary_field(summary, TOTAL_TYPES, min_confidence, _to_amount)
+            if total is not None:
+                data['total_amount'] = total
+        if 'date' not in data:
+            date = _best_summary_field(summary, DATE_TYPES, min_confidence, lambda t: find_date([t]))
+            if date:
+                data['date'] = date
+
+        for group in document.get('LineItemGroups', []):
+            for line_item in group.get('LineItems', []):
+                fields = {}
+                for field in line_item.get('LineItemExpenseFields', []):
+                    text, confidence = _value(field)
+                    fields[_field_type(field)] = (text, confidence)
+                name, name_confidence = fields.get('ITEM', ('', 0.0))
+                price_text, price_confidence = fields.get('PRICE', fields.get('UNIT_PRICE', ('', 0.0)))
+                price = _to_amount(price_text) if price_text else None
+                if not name or price is None:
+                    continue
+                if min(name_confidence, price_confidence) < min_confidence:
+                    items_confident = False
+                quantity_text = fields.get('QUANTITY', ('', 0.0))[0]
+                quantity = _to_quantity(quantity_text) if quantity_text else 1
+                unit_price = _to_amount(fields['UNIT_PRICE'][0]) if 'UNIT_PRICE' in fields else None
+                if quantity is None:
+                    # Not a whole-number count (e.g. a weight): one unit at the line total
+                    quantity, unit_price = 1, price
+                elif unit_price is None:
+                    # PRICE is the line total; FinancialData wants the price per unit
+                    unit_price = price / quantity
+                add_item(items, name, quantity, round(unit_price, 2))
+
+    if items and items_confident:
+        data['items'] = items
+    missing = [field for field in REQUIRED_FIELDS if field not in data]
+    return data, missing
+
+
+def merge_with_llm(expense_data, llm_data):
+    """
+    Confident AnalyzeExpense fields win; the LLM result fills in whatever is missing
+    """
+    if 'error' in llm_data:
+        return llm_data
+    merged = dict(llm_data)
+    merged.update(expense_data)
+    return merged
+
+
+if __name__ == '__main__':
+    # python -m utils.expense_analysis recorded_response.json [min_confidence]
+    with open(sys.argv[1]) as fixture:
+        recorded = json.load(fixture)
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 80.0
+    mapped, missing_fields = map_expense_response(recorded, threshold)
+    print(json.dumps({'data': mapped, 'missing': missing_fields, 'lines': expense_lines(recorded)}, indent=2))
@@ -0,0 +1,109 @@
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from utils.logger import get_logger
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it images go to OCR unchanged
+    Image = None
+    ImageOps = None
+
+logger = get_logger(__name__)
+
+# This module must not import config: pool workers are spawned fresh and re-import it,
+# and importing config opens a database connection. Settings are passed in instead.
+
+
+def normalize_image(file_bytes, max_dimension, jpeg_quality):
+    """
+    Auto-orient, grayscale, downscale and recompress an image for OCR.
+    Runs inside a pool worker process.
+    Returns: (bytes, dict) - (normalized JPEG bytes, {'width', 'height', 'scaled'})
+    """
+    with Image.open(io.BytesIO(file_bytes)) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('L')
+        scale = max_dimension / max(image.size)
+        if scale < 1:
+            new_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            image = image.resize(new_size, Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=jpeg_quality, optimize=True)
+        return output.getvalue(), {'width': image.width, 'height': image.height, 'scaled': scale < 1}
+
+
+class ImagePreprocessor:
+    """
+    Normalizes uploaded photos before OCR on a process pool (the work is CPU bound).
+    The longest side is capped at target_dpi * page_inches pixels, i.e. the photo is
+    treated as covering at most one page at the target resolution.
+    PDFs, unreadable images and results that would be larger than the input are passed
+    through unchanged.
+    """
+
+    def __init__(self, enabled, target_dpi, page_inches, jpeg_quality, workers):
+        self.enabled = enabled and Image is not None
+        self.max_dimension = int(target_dpi * page_inches)
+        self.jpeg_quality = jpeg_quality
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats = {'images': 0, 'skipped': 0, 'errors': 0, 'bytes_in': 0, 'bytes_out': 0, 'seconds': 0.0}
+        if enabled and Image is None:
+            logger.warning("Image preprocessing enabled but Pillow is not installed; skipping it")
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: never fork a process that is running request threads
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+        return self._executor
+
+    def process(self, file_bytes):
+        """
+        Returns: (bytes, dict) - (bytes to send to OCR, stats for this image or None if skipped)
+        """
+        if not self.enabled or file_bytes[:5] == b'%PDF-':
+            self._record(skipped=1)
+            return file_bytes, None
+        started = time.perf_counter()
+        try:
+            output, info = self._get_executor().submit(
+                normalize_image, file_bytes, self.max_dimension, self.jpeg_quality
+            ).result()
+        except Exception as e:
+            logger.warning(f"Image preprocessing failed, using original bytes: {str(e)}")
+            self._record(errors=1)
+            return file_bytes, None
+        elapsed = time.perf_counter() - started
+        if len(output) >= len(file_bytes):
+            output = file_bytes
+        stats = dict(info,
+                     bytes_in=len(file_bytes),
+                     bytes_out=len(output),
+                     bytes_saved=len(file_bytes) - len(output),
+                     seconds=round(elapsed, 4))
+        self._record(images=1, bytes_in=len(file_bytes), bytes_out=len(output), seconds=elapsed)
+        logger.info(f"Image preprocessed: {len(file_bytes)} -> {len(output)} bytes in {elapsed:.3f}s")
+        return output, stats
+
+    def _record(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                self._stats[name] += value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['bytes_saved'] = stats['bytes_in'] - stats['bytes_out']
+        stats['seconds'] = round(stats['seconds'], 4)
+        stats['enabled'] = self.enabled
+        return stats
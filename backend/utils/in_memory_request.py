@@ -0,0 +1,16 @@
+import io
+from flask import Request
+from config import UPLOAD_IN_MEMORY
+
+
+class InMemoryUploadRequest(Request):
+    """
+    Request class that keeps multipart file parts in memory instead of letting
+    Werkzeug spool anything over 500KB to a temporary file. Only used when
+    UPLOAD_IN_MEMORY is enabled; the size of the buffer is bounded by MAX_CONTENT_LENGTH.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if UPLOAD_IN_MEMORY:
+            return io.BytesIO()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
@@ -0,0 +1,58 @@
+import decimal
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; without it Flask's stdlib encoder is used
+    orjson = None
+
+
+def _default(obj):
+    # Same wire format as Flask's DefaultJSONProvider: Decimal as a string, dates as HTTP dates
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, date):
+        return http_date(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson (C encoder, several times faster than the stdlib
+    on bill lists full of Decimal values). Output is the same JSON as DefaultJSONProvider
+    in production: compact, sorted keys, Decimal as string, dates as HTTP dates; the one
+    difference is that non-ASCII text is sent as UTF-8 instead of \\u escapes.
+    Falls back to the stdlib provider when orjson is not installed, or for options only it supports.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.get('indent') or kwargs.get('cls'):
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self._pretty():
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        # Encoded straight to bytes; no str round-trip
+        body = orjson.dumps(obj, default=_default, option=option) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    def _pretty(self):
+        compact = self.compact
+        return compact is False or (compact is None and self._app.debug)
@@ -0,0 +1,112 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from utils.logger import get_logger
+from utils.metrics import register_metrics
+
+logger = get_logger(__name__)
+
+
+class LLMBatcher:
+    """
+    Collects extraction requests from concurrent uploads for up to `window_ms`
+    (or until `max_size` are waiting) and sends them as one multi-document call.
+    Every result is validated against FinancialData on its own; documents that come
+    back missing or invalid are retried with a single-document call, so callers see
+    the same results as without batching. Those retries run concurrently on their own
+    pool, and every document that succeeded is resolved before they start.
+    """
+
+    def __init__(self, ai_services, window_ms, max_size, dispatch_workers=4):
+        self.ai_services = ai_services
+        self.window = window_ms / 1000.0
+        self.max_size = max_size
+        self.dispatch_workers = dispatch_workers
+        self._lock = threading.Lock()
+        self._pid = None
+        self._stats = {'requests': 0, 'batches': 0, 'batched_documents': 0, 'single_fallbacks': 0}
+        register_metrics('llm_batcher', self.stats)
+
+    def _start(self):
+        # Started on first use, and again in a forked child (threads don't survive fork)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._dispatcher = ThreadPoolExecutor(max_workers=self.dispatch_workers, thread_name_prefix='llm-batch')
+            self._fallbacks = ThreadPoolExecutor(max_workers=self.max_size, thread_name_prefix='llm-fallback')
+            threading.Thread(target=self._collect, name='llm-batch-collector', daemon=True).start()
+            self._pid = os.getpid()
+
+    def submit(self, text):
+        """
+        Blocks until the text has been extracted; returns a FinancialData dict or {"error": ...}
+        """
+        self._start()
+        future = Future()
+        self._queue.put((text, future))
+        self._record(requests=1)
+        return future.result()
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._dispatcher.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        texts = [text for text, _ in batch]
+        try:
+            if len(batch) == 1:
+                results = [self.ai_services._invoke_function(texts[0], 'extract_financial_data')]
+            else:
+                results = self.ai_services.openai_batch_function_call(texts)
+                self._record(batches=1, batched_documents=len(batch))
+                logger.info(f"LLM batch of {len(batch)} documents extracted")
+        except Exception as e:
+            logger.error(f"LLM batch call failed for {len(batch)} documents: {str(e)}")
+            results = [{"error": str(e)} for _ in batch]
+
+        retries = []
+        for (text, future), result in zip(batch, results):
+            if 'error' in result and len(batch) > 1:
+                retries.append((text, future))
+            else:
+                future.set_result(result)
+
+        for text, future in retries:
+            self._record(single_fallbacks=1)
+            retry = self._fallbacks.submit(self.ai_services._invoke_function, text, 'extract_financial_data')
+            retry.add_done_callback(lambda done, future=future: self._resolve(future, done))
+
+    @staticmethod
+    def _resolve(future, done):
+        try:
+            future.set_result(done.result())
+        except Exception as e:
+            future.set_result({"error": str(e)})
+
+    def _record(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                self._stats[name] += value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['window_ms'] = int(self.window * 1000)
+        stats['max_size'] = self.max_size
+        stats['avg_batch_size'] = round(stats['batched_documents'] / stats['batches'], 2) if stats['batches'] else 0.0
+        return stats
@@ -0,0 +1,64 @@
+import hashlib
+import re
+from config import LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES
+from utils.bounded_cache import BoundedRedisCache
+from utils.metrics import register_metrics
+
+# Tokens that differ between reprints of the same receipt but never change the extracted
+# merchant, date, total or items. Dates and amounts are deliberately left alone: dates are
+# set aside before these run (see DATE_PATTERN), since some of them also match dates.
+VOLATILE_PATTERNS = [
+    # Labelled identifiers: "Trans ID: 8812-33", "Auth code 0A12B", "Ref #99812", "TID 0042"
+    re.compile(r'\b(?:trans(?:action)?|txn|auth(?:orization)?|approval|appr|ref(?:erence)?|seq(?:uence)?|'
+               r'terminal|term|tid|mid|merchant\s+id|batch|trace|invoice|inv|receipt|rcpt|'
+               r'register|cashier|operator|store)\s*(?:id|no|num|number|code|#)?\s*[:#.]?\s*[\w-]*\d[\w-]*'),
+    # Masked card numbers: "************1234", "xxxx xxxx xxxx 1234"
+    re.compile(r'(?:[x*]{2,}[\s-]?){1,4}\d{4}\b'),
+    # Times of day: "14:32", "2:05:17 pm"
+    re.compile(r'\b\d{1,2}:\d{2}(?::\d{2})?\s*(?:am|pm)?\b'),
+    # Long bare digit runs: barcodes, loyalty and survey codes (amounts always have a decimal point)
+    re.compile(r'(?<![\d.,])\d{8,}(?![\d.,])'),
+]
+
+# Numeric dates: 2024-01-15, 01/15/2024, 15.01.24 and bare YYYYMMDD. Two purchases that differ
+# only in date are different bills, so every date stays in the key.
+DATE_PATTERN = re.compile(
+    r'(?<![\d.,])(?:\d{4}[-/.]\d{1,2}[-/.]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}|'
+    r'(?:19|20)\d{2}(?:0[1-9]|1[0-2])(?:0[1-9]|[12]\d|3[01]))(?![\d,]|\.\d)'
+)
+# Holds a date's place while the volatile patterns run; matched by none of them
+DATE_PLACEHOLDER = '\x00'
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_receipt_text(text):
+    """
+    Canonical form of OCR text for cache keys: case folded, volatile tokens removed,
+    whitespace collapsed. Blank lines left behind by the removals are dropped.
+    """
+    lines = []
+    for line in text.casefold().replace(DATE_PLACEHOLDER, ' ').splitlines():
+        dates = iter(DATE_PATTERN.findall(line))
+        line = DATE_PATTERN.sub(DATE_PLACEHOLDER, line)
+        for pattern in VOLATILE_PATTERNS:
+            line = pattern.sub(' ', line)
+        line = re.sub(DATE_PLACEHOLDER, lambda _: next(dates), line)
+        line = WHITESPACE.sub(' ', line).strip()
+        if line:
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def llm_cache_key(text, function_name, model):
+    normalized = normalize_receipt_text(text)
+    return hashlib.sha256(f"{model}\0{function_name}\0{normalized}".encode('utf-8')).hexdigest()
+
+
+# Parsed LLM results keyed on the normalized OCR text
+llm_cache = BoundedRedisCache(
+    'llm_cache',
+    ttl=LLM_CACHE_TTL,
+    max_entries=LLM_CACHE_MAX_ENTRIES
+)
+register_metrics('llm_cache', llm_cache.stats)
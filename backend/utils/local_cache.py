@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class LocalLRUCache:
+    """
+    In-process, size-bounded LRU with a short TTL, in front of the Redis response cache.
+    Entries belong to a user so a user's entries can be dropped together. Every worker
+    subscribes to `channel`; a published user id drops that user's entries in every
+    process, and the TTL bounds staleness if a message is missed.
+    """
+
+    def __init__(self, max_entries, ttl, channel):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.channel = channel
+        self._entries = OrderedDict()  # (user_id, key) -> (expires_at, value)
+        self._epochs = {}  # user_id -> number of invalidations seen
+        self._lock = threading.Lock()
+        self._pid = None
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'resubscribes': 0}
+
+    def epoch(self, user_id):
+        """
+        Read before loading a value; set() refuses the value if the user was invalidated meanwhile
+        """
+        with self._lock:
+            return self._epochs.get(user_id, 0)
+
+    def get(self, user_id, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[(user_id, key)]
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end((user_id, key))
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def set(self, user_id, key, value, epoch):
+        with self._lock:
+            if self._epochs.get(user_id, 0) != epoch:
+                return
+            self._entries[(user_id, key)] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._epochs[user_id] = self._epochs.get(user_id, 0) + 1
+            for entry_key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[entry_key]
+            self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            for user_id in self._epochs:
+                self._epochs[user_id] += 1
+            self._entries.clear()
+
+    def start_listener(self, redis_client):
+        """
+        Subscribe to the invalidation channel on a daemon thread, once per process
+        (threads don't survive fork, so a forked worker starts its own)
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        # Nothing received before the subscription exists can be trusted
+        self.clear()
+        threading.Thread(target=self._listen, args=(redis_client,), name='cache-invalidation', daemon=True).start()
+
+    def _listen(self, redis_client):
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    if message.get('type') == 'message':
+                        self.invalidate_user(int(message['data']))
+            except Exception as e:
+                # Messages may have been missed while disconnected
+                logger.warning(f"Cache invalidation subscriber error, resubscribing: {str(e)}")
+                self.clear()
+                with self._lock:
+                    self._stats['resubscribes'] += 1
+                time.sleep(1)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        stats['max_entries'] = self.max_entries
+        stats['ttl'] = self.ttl
+        return stats
@@ -0,0 +1,69 @@
+import json
+import sys
+import click
+from flask.cli import with_appcontext
+from models.rollup import rebuild_rollups, check_rollups
+from models.search import rebuild_search_index
+from models.user import User
+from utils.cache_decorator import bump_user_cache_generation
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _bump_generations(user_id, reason):
+    """
+    Invalidate the cached responses of one user (or of every user when user_id is None)
+    """
+    try:
+        user_ids = [user_id] if user_id is not None else [user.id for user in User.query.with_entities(User.id)]
+        for uid in user_ids:
+            bump_user_cache_generation(uid)
+    except Exception as e:
+        logger.warning(f"{reason} but cache generations not bumped: {str(e)}")
+
+
+@click.group('rollups')
+def rollups_cli():
+    """Maintain the spend rollup tables (spend_daily, spend_monthly, spend_merchant_monthly)"""
+
+
+@rollups_cli.command('rebuild')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user (default: every user)')
+@with_appcontext
+def rebuild(user_id):
+    """Recompute the rollups from the bills table (backfill or repair)"""
+    count = rebuild_rollups(user_id)
+    # Cached analytics were computed from the old rollups
+    _bump_generations(user_id, "Rollups rebuilt")
+    click.echo(f"Rollups rebuilt from {count} bills")
+
+
+@rollups_cli.command('check')
+@click.option('--user-id', type=int, default=None, help='Only check this user (default: every user)')
+@with_appcontext
+def check(user_id):
+    """Compare the rollups with the bills table; exits non-zero on any mismatch"""
+    mismatches = check_rollups(user_id)
+    if not mismatches:
+        click.echo("Rollups are consistent with bills")
+        return
+    for mismatch in mismatches:
+        click.echo(json.dumps(mismatch))
+    click.echo(f"{len(mismatches)} mismatching rollup rows; run 'flask rollups rebuild' to repair", err=True)
+    sys.exit(1)
+
+
+@click.group('search')
+def search_cli():
+    """Maintain the full-text search index (bill_search)"""
+
+
+@search_cli.command('rebuild')
+@with_appcontext
+def rebuild_search():
+    """Re-index every bill's merchant and items (backfill)"""
+    count = rebuild_search_index()
+    # Cached search results were computed from the old index
+    _bump_generations(None, "Search index rebuilt")
+    click.echo(f"Search index rebuilt for {count} bills")
@@ -0,0 +1,27 @@
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# name -> zero-argument callable returning a JSON-serializable dict
+_providers = {}
+
+
+def register_metrics(name, provider):
+    """
+    Register a metrics provider that is reported under `name` by GET /metrics
+    """
+    _providers[name] = provider
+
+
+def collect_metrics():
+    """
+    Snapshot every registered provider; a failing provider is reported, not raised
+    """
+    snapshot = {}
+    for name, provider in _providers.items():
+        try:
+            snapshot[name] = provider()
+        except Exception as e:
+            logger.warning(f"Metrics provider {name} failed: {str(e)}")
+            snapshot[name] = {'error': str(e)}
+    return snapshot
@@ -0,0 +1,169 @@
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from utils.logger import get_logger
+
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:  # Local OCR is optional; without it only the Textract backend is available
+    pytesseract = None
+    Image = None
+
+logger = get_logger(__name__)
+
+# Like image_preprocessing, this module must not import config: Tesseract pool workers
+# are spawned fresh and re-import it. Settings and clients are passed in instead.
+
+
+class OCRBackend:
+    """
+    OCR engine interface. detect() takes document bytes and returns a Textract-shaped
+    response: {'Blocks': [{'BlockType': 'LINE', 'Text', 'Confidence', 'Geometry'}, ...]},
+    with LINE blocks in reading order, so everything downstream is engine agnostic.
+    """
+
+    name = None
+    # PDFs are split into single-page PDFs first; engines that only read images get the page's scan
+    accepts_pdf = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {'documents': 0, 'errors': 0, 'lines': 0, 'seconds': 0.0}
+
+    @property
+    def available(self):
+        return True
+
+    def detect(self, file_bytes):
+        started = time.perf_counter()
+        try:
+            response = self._detect(file_bytes)
+        except Exception:
+            self._record(errors=1)
+            raise
+        lines = sum(1 for block in response.get('Blocks', []) if block.get('BlockType') == 'LINE')
+        self._record(documents=1, lines=lines, seconds=time.perf_counter() - started)
+        return response
+
+    def _detect(self, file_bytes):
+        raise NotImplementedError
+
+    def _record(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                self._stats[name] += value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['seconds'] = round(stats['seconds'], 4)
+        stats['avg_seconds'] = round(stats['seconds'] / stats['documents'], 4) if stats['documents'] else 0.0
+        stats['available'] = self.available
+        return stats
+
+
+class TextractBackend(OCRBackend):
+    """
+    AWS Textract detect_document_text, called through the provider's resilience guard
+    """
+
+    name = 'textract'
+
+    def __init__(self, client_factory, guard):
+        super().__init__()
+        self.client_factory = client_factory
+        self.guard = guard
+
+    def _detect(self, file_bytes):
+        return self.guard.call(
+            self.client_factory().detect_document_text,
+            Document={'Bytes': file_bytes}
+        )
+
+
+def tesseract_lines(file_bytes, lang):
+    """
+    Run Tesseract over an image and group its words into LINE blocks.
+    Runs inside a pool worker process.
+    Returns: dict - Textract-shaped response with normalized bounding boxes
+    """
+    with Image.open(io.BytesIO(file_bytes)) as image:
+        image.load()
+        width, height = image.size
+        data = pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+
+    lines = {}
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        confidence = float(data['conf'][i])
+        if not word or confidence < 0:
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        box = (data['left'][i], data['top'][i],
+               data['left'][i] + data['width'][i], data['top'][i] + data['height'][i])
+        line = lines.setdefault(key, {'words': [], 'confidences': [], 'box': list(box)})
+        line['words'].append(word)
+        line['confidences'].append(confidence)
+        line['box'] = [min(line['box'][0], box[0]), min(line['box'][1], box[1]),
+                       max(line['box'][2], box[2]), max(line['box'][3], box[3])]
+
+    blocks = []
+    # Tesseract numbers blocks, paragraphs and lines in reading order
+    for key in sorted(lines):
+        line = lines[key]
+        left, top, right, bottom = line['box']
+        blocks.append({
+            'BlockType': 'LINE',
+            'Text': ' '.join(line['words']),
+            'Confidence': round(sum(line['confidences']) / len(line['confidences']), 2),
+            'Geometry': {'BoundingBox': {
+                'Left': left / width,
+                'Top': top / height,
+                'Width': (right - left) / width,
+                'Height': (bottom - top) / height
+            }}
+        })
+    return {'Blocks': blocks}
+
+
+class TesseractBackend(OCRBackend):
+    """
+    Local Tesseract OCR on a process pool sized to the cores (the work is CPU bound),
+    so nodes with spare CPU skip the network round-trip to Textract entirely.
+    Requires pytesseract, Pillow and the tesseract binary.
+    """
+
+    name = 'tesseract'
+    accepts_pdf = False
+
+    def __init__(self, workers=0, lang='eng'):
+        super().__init__()
+        self.workers = workers or os.cpu_count() or 1
+        self.lang = lang
+        self._executor = None
+
+    @property
+    def available(self):
+        return pytesseract is not None
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: never fork a process that is running request threads
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+        return self._executor
+
+    def _detect(self, file_bytes):
+        if not self.available:
+            raise RuntimeError("Tesseract OCR backend requires pytesseract and Pillow")
+        if file_bytes[:5] == b'%PDF-':
+            raise ValueError("Tesseract OCR backend does not accept PDF documents")
+        return self._get_executor().submit(tesseract_lines, file_bytes, self.lang).result()
@@ -0,0 +1,35 @@
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(after):
+    """
+    Opaque cursor for the (date, id) keyset position of the last row of a page
+    """
+    if after is None:
+        return None
+    date, row_id = after
+    raw = json.dumps([date.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns: tuple - (datetime, int); raises ValueError for a malformed cursor
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        date, row_id = json.loads(raw)
+        return datetime.fromisoformat(date), int(row_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def parse_date_param(value):
+    """
+    Parse a YYYY-MM-DD query parameter; None when absent, ValueError when malformed
+    """
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d')
@@ -0,0 +1,82 @@
+import io
+from utils.logger import get_logger
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # Without pypdf, PDFs are sent to OCR as a single document
+    PdfReader = None
+    PdfWriter = None
+
+logger = get_logger(__name__)
+
+
+def is_pdf(file_bytes):
+    return file_bytes[:5] == b'%PDF-'
+
+
+def split_pdf(file_bytes, max_pages):
+    """
+    Split a PDF into single-page PDFs (Textract's synchronous API takes one page at a time).
+    Returns: list of (bytes, str) - (single-page PDF, text layer of the page or '') in page order;
+    a one-element list holding the original bytes when pypdf is unavailable
+    """
+    if PdfReader is None:
+        logger.warning("pypdf is not installed; sending the PDF to OCR as one document")
+        return [(file_bytes, '')]
+    reader = PdfReader(io.BytesIO(file_bytes))
+    if len(reader.pages) > max_pages:
+        raise ValueError(f"PDF has {len(reader.pages)} pages; the maximum is {max_pages}")
+    if len(reader.pages) == 1:
+        return [(file_bytes, _page_text(reader.pages[0]))]
+    pages = []
+    for page in reader.pages:
+        writer = PdfWriter()
+        writer.add_page(page)
+        output = io.BytesIO()
+        writer.write(output)
+        pages.append((output.getvalue(), _page_text(page)))
+    return pages
+
+
+def _page_text(page):
+    # Digitally generated statements and invoices carry a text layer; scans do not
+    try:
+        return page.extract_text() or ''
+    except Exception as e:
+        logger.warning(f"Could not read PDF text layer: {str(e)}")
+        return ''
+
+
+def scanned_page_image(page_bytes):
+    """
+    The scan embedded in a single-page PDF, for OCR engines that only read images.
+    A scanned page is a full-page image, so the largest image on the page is the scan.
+    Returns: bytes - PNG of the page image, or None when the page has no image (or pypdf is unavailable)
+    """
+    if PdfReader is None:
+        return None
+    reader = PdfReader(io.BytesIO(page_bytes))
+    if len(reader.pages) != 1:
+        return None
+    try:
+        images = [image.image for image in reader.pages[0].images]
+    except Exception as e:
+        logger.warning(f"Could not read PDF page images: {str(e)}")
+        return None
+    images = [image for image in images if image is not None]
+    if not images:
+        return None
+    scan = max(images, key=lambda image: image.width * image.height)
+    output = io.BytesIO()
+    scan.save(output, format='PNG')
+    return output.getvalue()
+
+
+def text_layer_lines(text, min_chars):
+    """
+    Lines of a page's text layer, or None when it is too sparse to trust over OCR
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if min_chars <= 0 or sum(len(line) for line in lines) < min_chars:
+        return None
+    return lines
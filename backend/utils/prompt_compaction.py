@@ -0,0 +1,115 @@
+import re
+import threading
+from utils.receipt_parser import AMOUNT, QUALIFIER, TOTAL, DATE_PATTERNS, merge_split_amounts
+from utils.logger import get_logger
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding('o200k_base')
+except Exception:  # tiktoken is optional; fall back to ~4 characters per token
+    _encoding = None
+
+logger = get_logger(__name__)
+
+HAS_AMOUNT = re.compile(AMOUNT)
+# Receipt boilerplate that never carries merchant, date, total or item information. Only
+# whole phrases: single words such as "exchange", "points" or "signature" also appear in item
+# names, and only lines without an amount outside the header block are tested against these.
+BOILERPLATE = re.compile(
+    r'https?://|\bwww\.|'
+    r'\b(?:survey|feedback|tell us|how did we do|chance to win|sweepstakes|'
+    r'return policy|refund policy|exchange policy|returns? (?:accepted|allowed|within)|no (?:returns|refunds)|'
+    r'receipt required|within \d+ days|'
+    r'thank you|thanks for|come again|visit us|follow us|download (?:our|the) app|app store|'
+    r'(?:loyalty|rewards?) (?:number|member|program|balance)|points (?:earned|balance)|'
+    r'member(?:ship)? (?:number|id|since)|join today|sign up|'
+    r'customer copy|merchant copy|retain this|cardholder signature|signature:|i agree)(?!\w)',
+    re.IGNORECASE
+)
+
+
+def count_tokens(text):
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def _has_date(line):
+    return any(pattern.search(line) for pattern, _ in DATE_PATTERNS)
+
+
+class PromptCompactor:
+    """
+    Shrinks receipt text before it is sent to the LLM: outside the header block (which holds
+    the merchant and is always kept), drops boilerplate and lines that carry neither an amount
+    nor a date; removes repeated header lines, and trims to a token budget while keeping the
+    total lines. Lines with an amount are never dropped as boilerplate.
+    """
+
+    def __init__(self, token_budget, header_lines=5):
+        self.token_budget = token_budget
+        self.header_lines = header_lines
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'tokens_before': 0, 'tokens_after': 0}
+
+    def compact(self, text):
+        """
+        Returns: (str, dict) - (compacted text, {'tokens_before', 'tokens_after', 'lines_before', 'lines_after'})
+        """
+        raw_lines = [line for line in text.splitlines() if line.strip()]
+        lines = merge_split_amounts(raw_lines)
+
+        kept, seen = [], set()
+        for index, line in enumerate(lines):
+            in_header = index < self.header_lines
+            has_amount = HAS_AMOUNT.search(line) is not None
+            if not in_header and not has_amount and BOILERPLATE.search(line):
+                continue
+            # Repeated headers (page headers, reprinted store banners) carry no new information
+            if not has_amount:
+                key = line.casefold()
+                if key in seen:
+                    continue
+                seen.add(key)
+            next_is_qualifier = index + 1 < len(lines) and QUALIFIER.match(lines[index + 1])
+            if in_header or has_amount or _has_date(line) or next_is_qualifier:
+                kept.append(line)
+
+        kept = self._fit_budget(kept)
+        compacted = '\n'.join(kept)
+        stats = {
+            'tokens_before': count_tokens(text),
+            'tokens_after': count_tokens(compacted),
+            'lines_before': len(raw_lines),
+            'lines_after': len(kept)
+        }
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['tokens_before'] += stats['tokens_before']
+            self._stats['tokens_after'] += stats['tokens_after']
+        logger.info(f"Prompt compacted: {stats['tokens_before']} -> {stats['tokens_after']} tokens")
+        return compacted, stats
+
+    def _fit_budget(self, lines):
+        if count_tokens('\n'.join(lines)) <= self.token_budget:
+            return lines
+        # Reserve room for the total lines, then keep lines from the top until the budget is spent
+        totals = [line for line in lines if TOTAL.search(line.strip(' *:#-'))]
+        used = sum(count_tokens(line) + 1 for line in totals)
+        fitted = []
+        for line in lines:
+            if line in totals:
+                continue
+            cost = count_tokens(line) + 1
+            if used + cost > self.token_budget:
+                break
+            fitted.append(line)
+            used += cost
+        return fitted + totals
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['tokens_saved'] = stats['tokens_before'] - stats['tokens_after']
+        stats['token_budget'] = self.token_budget
+        return stats
@@ -0,0 +1,223 @@
+import re
+import threading
+from datetime import datetime
+from utils.ai_services import FinancialData
+
+AMOUNT = r'-?\$?\s?\d{1,6}[.,]\d{2}-?'
+# Trailing amount, optionally followed by a tax flag such as "N", "F", "T" or "TX"
+TRAILING_AMOUNT = re.compile(rf'^(?P<label>.*?)\s*(?P<amount>{AMOUNT})\s*(?:[A-Z]{{1,2}})?$')
+BARE_AMOUNT = re.compile(rf'^(?P<amount>{AMOUNT})\s*(?:[A-Z]{{1,2}})?$')
+# "2 @ 0.59", "2 x 0.59", "2 @ 0.59 ea"
+QUANTITY = re.compile(r'(?P<quantity>\d{1,4})\s*(?:@|x|X)\s*\$?(?P<unit>\d{1,6}[.,]\d{2})(?:\s*(?:ea|each|/ea))?')
+# A quantity line on its own, qualifying the item above it: "2 @ 0.59" or "2 @ 0.59  1.18"
+QUALIFIER = re.compile(rf'^{QUANTITY.pattern}(?:\s+{AMOUNT})?\s*(?:[A-Z]{{1,2}})?$')
+
+DATE_PATTERNS = [
+    (re.compile(r'\b(\d{4}-\d{2}-\d{2})\b'), ['%Y-%m-%d']),
+    (re.compile(r'\b(\d{1,2}/\d{1,2}/\d{4})\b'), ['%m/%d/%Y']),
+    (re.compile(r'\b(\d{1,2}/\d{1,2}/\d{2})\b'), ['%m/%d/%y']),
+    (re.compile(r'\b(\d{1,2}-\d{1,2}-\d{4})\b'), ['%m-%d-%Y']),
+    (re.compile(r'\b(\d{1,2}\s+[A-Za-z]{3}\s+\d{4})\b'), ['%d %b %Y']),
+    (re.compile(r'\b([A-Za-z]{3}\s+\d{1,2},?\s+\d{4})\b'), ['%b %d, %Y', '%b %d %Y']),
+]
+
+SUBTOTAL = re.compile(r'^sub\s*-?\s*total\b', re.IGNORECASE)
+TAX = re.compile(r'^(?:sales\s+)?(?:tax|hst|gst|pst|vat)\b', re.IGNORECASE)
+TOTAL = re.compile(r'^(?:grand\s+|order\s+)?total(?!\s+(?:tax|savings?|items?|discounts?|number))\b|^(?:amount|balance)\s+due\b', re.IGNORECASE)
+# Lines after the items that carry amounts but are not purchases
+NON_ITEM = re.compile(
+    r'\b(?:change|cash|tend(?:er|ered)?|visa|mastercard|master\s*card|amex|discover|debit|credit|'
+    r'card|payment|paid|balance|savings?|you\s+saved|points|rewards?|tip|gratuity)\b',
+    re.IGNORECASE
+)
+
+
+class ReceiptTemplate:
+    """
+    Layout rules for one merchant. `match` is tested against the first lines of the
+    receipt; the optional patterns override the generic ones where a chain's layout differs.
+    """
+
+    def __init__(self, merchant_name, match, total=None, subtotal=None, tax=None, ignore=None, header_lines=6):
+        self.merchant_name = merchant_name
+        self.match = re.compile(match, re.IGNORECASE)
+        self.total = re.compile(total, re.IGNORECASE) if total else TOTAL
+        self.subtotal = re.compile(subtotal, re.IGNORECASE) if subtotal else SUBTOTAL
+        self.tax = re.compile(tax, re.IGNORECASE) if tax else TAX
+        self.ignore = re.compile(ignore, re.IGNORECASE) if ignore else None
+        self.header_lines = header_lines
+
+
+RECEIPT_TEMPLATES = [
+    ReceiptTemplate('Costco', r'\bcostco\b', ignore=r'^(?:member|instant savings|\*+\s*total number)'),
+    ReceiptTemplate('Walmart', r'\bwal[\s-]?mart\b', ignore=r'^(?:st#|op#|te#|tr#|tc#)'),
+    ReceiptTemplate('Target', r'^\s*target\b', ignore=r'^(?:regular price|redcard)'),
+    ReceiptTemplate("Trader Joe's", r"\btrader\s+joe'?s\b"),
+    ReceiptTemplate('Whole Foods Market', r'\bwhole\s+foods\b', ignore=r'^(?:prime member|item savings)'),
+    ReceiptTemplate('Kroger', r'\bkroger\b', ignore=r'^(?:sc\b|kroger savings)'),
+    ReceiptTemplate('Safeway', r'\bsafeway\b', ignore=r'^(?:club card|member savings)'),
+    ReceiptTemplate('CVS Pharmacy', r'\bcvs\b', ignore=r'^(?:extracare|extrabucks)'),
+    ReceiptTemplate('Walgreens', r'\bwalgreens\b', ignore=r'^(?:mywalgreens|wag)'),
+    ReceiptTemplate('Starbucks', r'\bstarbucks\b'),
+]
+
+
+def _to_amount(text):
+    text = text.replace('$', '').replace(' ', '').replace(',', '.')
+    negative = text.startswith('-') or text.endswith('-')
+    value = float(text.strip('-'))
+    return -value if negative else value
+
+
+def find_date(lines):
+    for line in lines:
+        for pattern, formats in DATE_PATTERNS:
+            match = pattern.search(line)
+            if not match:
+                continue
+            for fmt in formats:
+                try:
+                    return datetime.strptime(match.group(1), fmt).strftime('%Y-%m-%d')
+                except ValueError:
+                    continue
+    return None
+
+
+def merge_split_amounts(lines):
+    """
+    Textract emits a far-right price column as separate LINE blocks; join a bare amount
+    back onto the text line before it.
+    """
+    merged = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if merged and BARE_AMOUNT.match(line) and not TRAILING_AMOUNT.match(merged[-1]):
+            merged[-1] = f"{merged[-1]} {line}"
+        else:
+            merged.append(line)
+    return merged
+
+
+def add_item(items, name, quantity, price):
+    for item in items:
+        if item['name'] == name:
+            if abs(item['price'] - price) < 0.005:
+                item['quantity'] += quantity
+                return
+            # uix_item_bill forbids repeated descriptions within a bill
+            name = f"{name} ({sum(1 for i in items if i['name'].startswith(name)) + 1})"
+            break
+    items.append({'name': name, 'quantity': quantity, 'price': price})
+
+
+class ReceiptParser:
+    """
+    Deterministic parser over Textract LINE text for receipts with a known layout.
+    parse() returns a FinancialData dict and a confidence in [0, 1]; only a known
+    template, a date, a total and items that reconcile with the total reach 1.0.
+    """
+
+    def __init__(self, templates=None, tolerance=0.01):
+        self.templates = templates if templates is not None else RECEIPT_TEMPLATES
+        self.tolerance = tolerance
+        self._lock = threading.Lock()
+        self._stats = {'parsed': 0, 'accepted': 0, 'fallbacks': 0}
+
+    def _match_template(self, lines):
+        for template in self.templates:
+            if any(template.match.search(line) for line in lines[:template.header_lines]):
+                return template
+        return None
+
+    def parse(self, lines):
+        """
+        Returns: (dict, float, bool) - (FinancialData dict or None, confidence, reconciled)
+        """
+        lines = merge_split_amounts(lines)
+        if not lines:
+            return None, 0.0, False
+
+        template = self._match_template(lines)
+        if template:
+            merchant_name, confidence = template.merchant_name, 0.25
+        else:
+            # First line that is not a number, address or phone is usually the store name
+            merchant_name = next((l for l in lines[:3] if not re.search(r'\d{3}', l)), None)
+            confidence = 0.1 if merchant_name else 0.0
+            template = ReceiptTemplate(merchant_name or '', r'$^')
+
+        date = find_date(lines)
+        if date:
+            confidence += 0.2
+
+        items, subtotal, total, tax = [], None, None, 0.0
+        pending_name = None
+        for line in lines:
+            qualifier = QUALIFIER.match(line)
+            if qualifier and total is None:
+                if pending_name:
+                    name = pending_name
+                elif items:
+                    name = items.pop()['name']
+                else:
+                    name = None
+                if name:
+                    add_item(items, name, int(qualifier.group('quantity')), round(_to_amount(qualifier.group('unit')), 2))
+                pending_name = None
+                continue
+            match = TRAILING_AMOUNT.match(line)
+            if not match:
+                pending_name = line
+                continue
+            pending_name = None
+            label, amount = match.group('label').strip(' *:#-'), _to_amount(match.group('amount'))
+            if template.subtotal.search(label):
+                subtotal = amount
+            elif template.tax.search(label):
+                tax += amount
+            elif template.total.search(label):
+                if total is None:
+                    total = amount
+            elif total is None and label and not NON_ITEM.search(label) and \
+                    not (template.ignore and template.ignore.search(label)):
+                quantity_match = QUANTITY.search(label)
+                if quantity_match and label[:quantity_match.start()].strip():
+                    quantity = int(quantity_match.group('quantity'))
+                    price = _to_amount(quantity_match.group('unit'))
+                    name = label[:quantity_match.start()].strip()
+                else:
+                    quantity, price, name = 1, amount, label
+                add_item(items, name, quantity, round(price, 2))
+
+        if total is not None:
+            confidence += 0.2
+
+        reconciled = self._reconciles(items, subtotal, tax, total)
+        if reconciled:
+            confidence += 0.35
+
+        if not (merchant_name and date and total is not None and items):
+            return None, round(confidence, 2), reconciled
+        data = FinancialData(merchant_name=merchant_name, total_amount=total, date=date, items=items).dict()
+        return data, round(confidence, 2), reconciled
+
+    def _reconciles(self, items, subtotal, tax, total):
+        if not items or total is None:
+            return False
+        items_sum = round(sum(item['quantity'] * item['price'] for item in items), 2)
+        if subtotal is not None:
+            return abs(items_sum - subtotal) <= self.tolerance and abs(subtotal + tax - total) <= self.tolerance
+        return abs(items_sum + tax - total) <= self.tolerance
+
+    def record(self, accepted):
+        with self._lock:
+            self._stats['parsed'] += 1
+            self._stats['accepted' if accepted else 'fallbacks'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['accept_ratio'] = round(stats['accepted'] / stats['parsed'], 4) if stats['parsed'] else 0.0
+        return stats
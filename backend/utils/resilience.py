@@ -0,0 +1,283 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from botocore.exceptions import ClientError
+from config import (
+    TEXTRACT_TIMEOUT, OPENAI_TIMEOUT, RESILIENCE_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY,
+    RETRY_BUDGET_RATIO, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT, HEDGING_ENABLED, HEDGE_MIN_SAMPLES
+)
+from utils.logger import get_logger
+from utils.metrics import register_metrics
+
+logger = get_logger(__name__)
+
+
+class ProviderUnavailableError(Exception):
+    """Raised without calling the provider while its circuit breaker is open"""
+
+
+class ProviderTimeoutError(Exception):
+    """Raised when a provider call exceeds its deadline"""
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures; open -> half_open after
+    `reset_timeout` seconds, when a single trial call is let through; the trial's outcome
+    closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_count = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._trial_in_flight = False
+            if self.state == 'closed':
+                return True
+            if self.state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """
+        End a half-open trial that proved nothing about the provider (e.g. a rejected document);
+        the next call becomes the trial
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.open_count += 1
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class RetryBudget:
+    """
+    Retries are allowed while they stay under `ratio` of recent calls: every call deposits
+    `ratio` tokens (capped) and every retry or hedge withdraws one. `min_tokens` lets a
+    quiet process still retry occasionally.
+    """
+
+    def __init__(self, ratio, min_tokens=3.0, max_tokens=20.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class ResilientCaller:
+    """
+    Wraps calls to one remote provider with a per-call deadline, jittered exponential
+    backoff within a retry budget, a circuit breaker, and optional hedging: when a call
+    is still running after the provider's recent p95 latency a second identical call is
+    started and the first to finish wins.
+
+    Calls run on this caller's thread pool so the deadline can be enforced; a call that
+    misses its deadline keeps running in the background until the client's own socket
+    timeout ends it.
+    """
+
+    def __init__(self, name, timeout, max_attempts, base_delay, max_delay, budget_ratio,
+                 failure_threshold, reset_timeout, hedging=False, hedge_min_samples=20,
+                 is_retriable=None, workers=32):
+        self.name = name
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedging = hedging
+        self.hedge_min_samples = hedge_min_samples
+        self.is_retriable = is_retriable or (lambda error: True)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.budget = RetryBudget(budget_ratio)
+        self.workers = workers
+        self._executor = None
+        self._executor_pid = None
+        self._latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'successes': 0, 'failures': 0, 'timeouts': 0,
+                       'retries': 0, 'hedges': 0, 'short_circuited': 0}
+
+    def call(self, fn, *args, **kwargs):
+        self._record(calls=1)
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            attempt += 1
+            if not self.breaker.allow():
+                self._record(short_circuited=1)
+                raise ProviderUnavailableError(f"{self.name} is unavailable (circuit open)")
+            try:
+                result = self._attempt(fn, args, kwargs)
+            except Exception as e:
+                retriable = self.is_retriable(e)
+                if retriable:
+                    self.breaker.record_failure()
+                else:
+                    # Non-retriable errors are the caller's fault, not a sign the provider is unhealthy
+                    self.breaker.release_trial()
+                if isinstance(e, ProviderTimeoutError):
+                    self._record(timeouts=1)
+                if not retriable or attempt >= self.max_attempts or not self.budget.withdraw():
+                    self._record(failures=1)
+                    raise
+                self._record(retries=1)
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                logger.warning(f"{self.name} call failed ({str(e)}), retry {attempt} in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self._record(successes=1)
+            return result
+
+    def _attempt(self, fn, args, kwargs):
+        started = time.monotonic()
+        executor = self._get_executor()
+        futures = {executor.submit(fn, *args, **kwargs)}
+        hedge_after = self._hedge_delay()
+        if hedge_after is not None and hedge_after < self.timeout:
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done and self.budget.withdraw():
+                self._record(hedges=1)
+                futures.add(executor.submit(fn, *args, **kwargs))
+        remaining = self.timeout - (time.monotonic() - started)
+        pending = set(futures)
+        while pending and remaining > 0:
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self._observe(time.monotonic() - started)
+                    return future.result()
+            if not pending:
+                # An error only counts once every copy (primary and hedge) has failed
+                return next(iter(done)).result()
+            remaining = self.timeout - (time.monotonic() - started)
+        raise ProviderTimeoutError(f"{self.name} call exceeded {self.timeout}s")
+
+    def _get_executor(self):
+        # Rebuilt in a forked child, whose copy of the parent's pool has no threads
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.name}-call")
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _hedge_delay(self):
+        if not self.hedging:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def _observe(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _record(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                self._stats[name] += value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            ordered = sorted(self._latencies)
+        stats.update({
+            'breaker_state': self.breaker.state,
+            'breaker_open': 1 if self.breaker.state == 'open' else 0,
+            'breaker_opened_total': self.breaker.open_count,
+            'consecutive_failures': self.breaker.failures,
+            'retry_budget_tokens': round(self.budget.tokens, 2),
+            'p95_latency': round(ordered[int(len(ordered) * 0.95) - 1], 4) if ordered else None,
+            'timeout': self.timeout
+        })
+        return stats
+
+
+# Client-side errors from AWS that retrying cannot fix
+NON_RETRIABLE_AWS_CODES = {
+    'InvalidParameterException', 'UnsupportedDocumentException', 'BadDocumentException',
+    'DocumentTooLargeException', 'InvalidS3ObjectException', 'AccessDeniedException',
+    'ValidationException', 'InvalidSignatureException', 'UnrecognizedClientException'
+}
+
+
+def _aws_retriable(error):
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code') not in NON_RETRIABLE_AWS_CODES
+    return True
+
+
+def _openai_retriable(error):
+    # openai.BadRequestError / AuthenticationError / PermissionDeniedError / NotFoundError
+    status = getattr(error, 'status_code', None)
+    return status is None or status == 429 or status >= 500
+
+
+textract_guard = ResilientCaller(
+    'textract',
+    timeout=TEXTRACT_TIMEOUT,
+    max_attempts=RESILIENCE_MAX_ATTEMPTS,
+    base_delay=RETRY_BASE_DELAY,
+    max_delay=RETRY_MAX_DELAY,
+    budget_ratio=RETRY_BUDGET_RATIO,
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=BREAKER_RESET_TIMEOUT,
+    hedging=HEDGING_ENABLED,
+    hedge_min_samples=HEDGE_MIN_SAMPLES,
+    is_retriable=_aws_retriable
+)
+openai_guard = ResilientCaller(
+    'openai',
+    timeout=OPENAI_TIMEOUT,
+    max_attempts=RESILIENCE_MAX_ATTEMPTS,
+    base_delay=RETRY_BASE_DELAY,
+    max_delay=RETRY_MAX_DELAY,
+    budget_ratio=RETRY_BUDGET_RATIO,
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=BREAKER_RESET_TIMEOUT,
+    hedging=HEDGING_ENABLED,
+    hedge_min_samples=HEDGE_MIN_SAMPLES,
+    is_retriable=_openai_retriable
+)
+register_metrics('textract_resilience', textract_guard.stats)
+register_metrics('openai_resilience', openai_guard.stats)
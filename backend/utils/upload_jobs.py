@@ -0,0 +1,81 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.exc import IntegrityError
+from models.user import db
+from models.upload import Upload
+from utils.upload_pipeline import process_bill_file, discard_source
+from utils.logger import get_logger
+from config import UPLOAD_JOB_WORKERS
+
+logger = get_logger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    # Created lazily so that forked gunicorn workers each get their own pool
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=UPLOAD_JOB_WORKERS,
+                    thread_name_prefix='upload-job'
+                )
+    return _executor
+
+
+def submit_upload_job(app, upload_id, user_id, source, content_type, ocr_backend=None):
+    """
+    Queue a saved upload for background extraction.
+    `source` is a file path or an in-memory buffer (see process_bill_file).
+    The Upload row must already exist with status 'processing'.
+    """
+    return _get_executor().submit(_run_upload_job, app, upload_id, user_id, source, content_type, ocr_backend)
+
+
+def _set_stage(upload, stage):
+    upload.stage = stage
+    db.session.commit()
+
+
+def _run_upload_job(app, upload_id, user_id, source, content_type, ocr_backend=None):
+    with app.app_context():
+        upload = Upload.get_upload(upload_id)
+        if upload is None:
+            logger.error(f"Upload job {upload_id} not found")
+            return
+        try:
+            bill, error_message = process_bill_file(
+                user_id,
+                source,
+                content_type,
+                on_stage=lambda stage: _set_stage(upload, stage),
+                ocr_backend=ocr_backend
+            )
+            # The bill is saved even when archival failed, so the job completes (and counts
+            # toward the quota); the archival error is reported as a warning
+            upload.bill_id = bill.id
+            upload.status = 'completed'
+            upload.error_message = error_message[:512] if error_message else None
+            upload.stage = None
+            db.session.commit()
+            logger.info(f"Upload job {upload_id} finished for user {user_id} with status {upload.status}")
+        except IntegrityError as ie:
+            db.session.rollback()
+            logger.error(f"Duplicate bill detected in upload job {upload_id} for user {user_id}: {str(ie)}")
+            _fail(upload, 'Duplicate bill not allowed. This bill already exists. Please upload a different bill.')
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Upload job {upload_id} failed for user {user_id}: {str(e)}")
+            _fail(upload, str(e))
+        finally:
+            discard_source(source)
+            db.session.remove()
+
+
+def _fail(upload, message):
+    upload.status = 'failed'
+    upload.error_message = message[:512]
+    db.session.commit()
@@ -0,0 +1,153 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.exc import IntegrityError
+from models.user import User, db
+from models.upload import Upload
+from utils.data_extraction import DataExtractor
+from utils.logger import get_logger
+from utils.cache_decorator import bump_user_cache_generation
+from config import BATCH_UPLOAD_WORKERS
+
+logger = get_logger(__name__)
+
+
+def discard_source(source):
+    """
+    Remove a staged upload: deletes the temporary file, or releases the in-memory buffer
+    """
+    if isinstance(source, str):
+        if os.path.exists(source):
+            os.remove(source)
+            logger.info(f"Temporary file deleted: {source}")
+    else:
+        source.close()
+
+
+def process_bill_file(user_id, source, content_type, on_stage=None, ocr_backend=None):
+    """
+    Extract a staged upload, persist the bill and archive the image to S3.
+    `source` is either a path in UPLOAD_FOLDER or an in-memory buffer (io.BytesIO);
+    a buffer is handed to OCR and to the S3 put without being written to disk.
+    `ocr_backend` names the OCR engine for this file (None = the OCR_BACKEND default).
+    The S3 put starts before extraction under a pending key and runs concurrently with it;
+    the object is tagged with the bill id once the bill is saved, or deleted if extraction
+    or the DB write fails.
+    Shared by the synchronous upload route and the background job workers.
+    Raises IntegrityError (after rollback) when the bill is a duplicate.
+    Returns: (Bill, str) - (bill, error_message); error_message is set when S3 archival failed
+    """
+    def report(stage):
+        if on_stage:
+            on_stage(stage)
+
+    bucket_name = os.environ.get('S3_BUCKET_NAME', 'spendlytic')
+    user_obj = User.query.get(user_id)
+
+    if isinstance(source, str):
+        file_bytes = None
+        s3_body = source
+    else:
+        # getvalue() shares the buffer's bytes rather than copying them; the S3 put gets
+        # its own view so its reads don't move the position of the request buffer
+        file_bytes = source.getvalue()
+        s3_body = io.BytesIO(file_bytes)
+
+    s3_future = DataExtractor.upload_image_to_s3_async(
+        s3_body,
+        bucket_name=bucket_name,
+        user_id=f"{user_obj.username}_pending",
+        content_type=content_type,
+        folder="uploads",
+        tags={'state': 'pending', 'user_id': user_id}
+    )
+
+    try:
+        report('extracting')
+        data_extractor = DataExtractor(ocr_backend=ocr_backend)
+        if file_bytes is None:
+            result = data_extractor.extract_text_from_file(source)
+        else:
+            result = data_extractor.extract_text_from_bytes(file_bytes)
+        analysis = result['analysis']
+        if 'error' in analysis:
+            raise Exception(f"Extraction failed: {analysis['error']}")
+
+        report('saving')
+        bill = User.save_extracted_data(db, user_id, analysis)
+        logger.info(f"Extracted data saved to DB for user {user_id}, bill id: {bill.id}")
+    except Exception:
+        s3_future.add_done_callback(lambda future: _discard_pending_object(bucket_name, future))
+        raise
+
+    try:
+        report('archiving')
+        s3_key = s3_future.result()
+        if s3_key is None:
+            logger.error(f"Failed to upload image to S3 for user {user_id}, bill id: {bill.id}")
+            return bill, 'Failed to upload image to S3.'
+        if not DataExtractor.tag_s3_object(bucket_name, s3_key, {'state': 'final', 'user_id': user_id, 'bill_id': bill.id}):
+            logger.warning(f"Failed to tag S3 object {s3_key} for bill id: {bill.id}")
+        bill.s3_key = s3_key
+        db.session.commit()
+    finally:
+        # The bill is committed whether or not archival succeeds: invalidate every cached
+        # view of this user (bills, pages, items, analytics, search) on every exit
+        _invalidate_user_caches(user_id)
+    return bill, None
+
+
+def _invalidate_user_caches(user_id):
+    try:
+        bump_user_cache_generation(user_id)
+    except Exception as e:
+        logger.warning(f"Failed to clear cache for user {user_id}: {str(e)}")
+
+
+def _discard_pending_object(bucket_name, future):
+    s3_key = future.result()
+    if s3_key and DataExtractor.delete_s3_object(bucket_name, s3_key):
+        logger.info(f"Deleted pending S3 object after failed extraction: {s3_key}")
+
+
+def process_bill_batch(app, user_id, entries, ocr_backend=None):
+    """
+    Run process_bill_file over many staged uploads on a bounded thread pool.
+    `entries` is a list of (filename, source, file_size, content_type); every source is discarded.
+    Returns: list of per-file result dicts (status: success, duplicate or error), in input order
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(BATCH_UPLOAD_WORKERS, len(entries))),
+                            thread_name_prefix='upload-batch') as pool:
+        futures = [pool.submit(_process_batch_entry, app, user_id, *entry, ocr_backend=ocr_backend) for entry in entries]
+        return [future.result() for future in futures]
+
+
+def _process_batch_entry(app, user_id, filename, source, file_size, content_type, ocr_backend=None):
+    with app.app_context():
+        try:
+            bill, s3_error = process_bill_file(user_id, source, content_type, ocr_backend=ocr_backend)
+            # The bill is saved even when archival failed: record the upload so it counts toward the quota
+            upload = Upload(
+                user_id=user_id,
+                filename=filename,
+                file_size=file_size
+            )
+            upload.bill_id = bill.id
+            upload.error_message = s3_error
+            db.session.add(upload)
+            db.session.commit()
+            result = {'filename': filename, 'status': 'success', 'data': bill.to_dict()}
+            if s3_error:
+                result['warning'] = s3_error
+            return result
+        except IntegrityError as ie:
+            db.session.rollback()
+            logger.info(f"Duplicate bill in batch for user {user_id}: {filename}: {str(ie)}")
+            return {'filename': filename, 'status': 'duplicate', 'message': 'Duplicate bill not allowed. This bill already exists.'}
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error processing {filename} in batch for user {user_id}: {str(e)}")
+            return {'filename': filename, 'status': 'error', 'message': str(e)}
+        finally:
+            discard_source(source)
+            db.session.remove()